@@ -41,6 +41,7 @@ setup(
     license="MIT",
     packages=find_packages(),
     install_requires=["lxml", "pyyaml"],
+    extras_require={"arrow": ["pyarrow"]},
     include_package_data=True,
     zip_safe=False,
 )
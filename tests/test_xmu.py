@@ -1,5 +1,8 @@
+from copy import deepcopy
 from datetime import date, datetime, time, timedelta
+import json
 import os
+import pickle
 import zipfile
 
 import pytest
@@ -7,6 +10,7 @@ from lxml import etree
 
 from xmu import (
     EMuColumn,
+    EMuCompactRecord,
     EMuConfig,
     EMuDate,
     EMuFloat,
@@ -17,6 +21,7 @@ from xmu import (
     EMuRow,
     EMuSchema,
     EMuTime,
+    cache_info,
     get_mod,
     has_mod,
     is_nesttab,
@@ -24,11 +29,14 @@ from xmu import (
     is_ref,
     is_ref_tab,
     is_tab,
+    set_cache_size,
     strip_mod,
     strip_tab,
     write_import,
     write_group,
+    coerce_records,
 )
+from xmu.types import EMuType
 
 
 @pytest.fixture(scope="session")
@@ -358,6 +366,41 @@ def xml_file(output_dir):
     return str(path)
 
 
+@pytest.fixture
+def xml_file_many(xml_file, tmp_path):
+    with open(xml_file) as f:
+        xml = f.read()
+    head, tail = xml.split("  <!-- Row 1 -->")
+    body, foot = tail.rsplit("</table>", 1)
+    rows = []
+    for i in range(500):
+        row = body.replace(
+            '<atom name="irn">1000000</atom>', f'<atom name="irn">{i}</atom>', 1
+        )
+        rows.append(f"  <!-- Row {i + 1} -->{row}")
+    path = tmp_path / "xmldata_many.xml"
+    with open(path, "w") as f:
+        f.write(head + "".join(rows) + "</table>" + foot)
+    return str(path)
+
+
+@pytest.fixture
+def xml_file_cdata(tmp_path):
+    rows = []
+    for i in range(4):
+        rows.append(f'  <tuple>\n    <atom name="irn">{i}</atom>\n')
+        if i == 1:
+            # Tags inside text that is not parsed as XML
+            rows.append('    <atom name="EmuText">a<![CDATA[<tuple>]]>b</atom>\n')
+            rows.append("    <!-- <tuple> -->\n    <?xmu <table> ?>\n")
+        rows.append("  </tuple>\n")
+    path = tmp_path / "xmldata_cdata.xml"
+    with open(path, "w") as f:
+        f.write('<?xml version="1.0" encoding="UTF-8" ?>\n<table name="emain">\n')
+        f.write("".join(rows) + "</table>\n")
+    return str(path)
+
+
 @pytest.fixture
 def rec(xml_file, config_file):
     reader = EMuReader(xml_file)
@@ -412,6 +455,145 @@ def test_schema_from_config(config_file, schema_file):
     assert EMuSchema() == EMuSchema(schema_file)
 
 
+def test_schema_cache(schema_file):
+    schema = EMuSchema(schema_file)
+    cache_path = os.path.splitext(schema_file)[0] + ".cache"
+    cached = EMuSchema.__new__(EMuSchema)
+    cached.from_cache(cache_path, source=schema_file)
+    assert cached == schema
+    assert cached._index.keys() == schema._index.keys()
+
+
+def test_schema_cache_out_of_date(schema_file, tmp_path):
+    path = tmp_path / "schema.pl"
+    with open(schema_file, encoding="utf-8") as f:
+        pl = f.read()
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(pl)
+    EMuSchema(path)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(pl.replace("ItemName => 'Text',", "ItemName => 'Modified',"))
+    with pytest.raises(IOError, match=r"Cache file is out of date"):
+        EMuSchema.__new__(EMuSchema).from_cache(tmp_path / "schema.cache", path)
+    schema = EMuSchema(path)
+    assert schema.get_field_info("emain", "EmuText")["ItemName"] == "Modified"
+    assert EMuSchema(tmp_path / "schema.json") == schema
+
+
+def test_schema_cache_missing_json_out_of_date(schema_file, tmp_path):
+    path = tmp_path / "schema.pl"
+    with open(schema_file, encoding="utf-8") as f:
+        pl = f.read()
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(pl)
+    EMuSchema(path)
+    os.remove(tmp_path / "schema.cache")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(pl.replace("ItemName => 'Text',", "ItemName => 'Modified',"))
+    schema = EMuSchema(path)
+    assert schema.get_field_info("emain", "EmuText")["ItemName"] == "Modified"
+    os.remove(tmp_path / "schema.json")
+    schema = EMuSchema(path)
+    assert schema.get_field_info("emain", "EmuText")["ItemName"] == "Modified"
+
+
+def test_schema_cache_invalid(schema_file, tmp_path):
+    with open(schema_file, encoding="utf-8") as f:
+        pl = f.read()
+    with open(tmp_path / "schema.pl", "w", encoding="utf-8") as f:
+        f.write(pl)
+    with open(tmp_path / "schema.cache", "wb") as f:
+        f.write(b"XMUSCHEM")
+    assert EMuSchema(tmp_path / "schema.pl") == EMuSchema(schema_file)
+    EMuSchema.__new__(EMuSchema).from_cache(tmp_path / "schema.cache")
+
+
+def test_schema_read_pl(tmp_path):
+    pl = """# Comment with an unmatched 'quote
+%Schema =
+(
+    emain =>
+    {
+        'Quoted Key' => 'Text with \\'quotes\\', commas, and => arrows',
+        "Double" => "Text",
+        Bareword => Text
+        Integer => -15,
+        Empty => [],
+        List => [ 15 ],
+        Nested =>
+        [
+            [ 8, 2, 2 ],
+            'Text',
+            { Key => 'Val' },
+        ],
+    },
+);
+
+1;
+"""
+    path = tmp_path / "schema.pl"
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(pl)
+    assert EMuSchema.__new__(EMuSchema)._read_schema_pl(path) == {
+        "Schema": {
+            "emain": {
+                "Quoted Key": "Text with 'quotes', commas, and => arrows",
+                "Double": "Text",
+                "Bareword": "Text",
+                "Integer": -15,
+                "Empty": [],
+                "List": [15],
+                "Nested": [[8, 2, 2], "Text", {"Key": "Val"}],
+            }
+        }
+    }
+
+
+def test_schema_lazy(schema_file):
+    EMuSchema.config = None
+    schema = EMuSchema(schema_file)
+    lazy = EMuSchema(schema_file, lazy=True)
+    modules = dict.__getitem__(lazy, "Schema")
+    assert lazy.modules == ["emain", "eref"]
+    assert not dict.keys(modules)
+    assert lazy.get_field_info("emain", "EmuText") == schema.get_field_info(
+        "emain", "EmuText"
+    )
+    assert list(dict.keys(modules)) == ["emain"]
+    lazy.get_field_info("emain", "EmuRef.EmuRefOnly")
+    assert list(dict.keys(modules)) == ["emain", "eref"]
+    assert lazy == schema
+
+
+def test_schema_lazy_iterfields(schema_file):
+    schema = EMuSchema(schema_file)
+    lazy = EMuSchema(schema_file, lazy=True)
+    assert list(lazy.iterfields()) == list(schema.iterfields())
+
+
+def test_schema_lazy_bad_module(schema_file):
+    with pytest.raises(KeyError, match=r"Path not found"):
+        EMuSchema(schema_file, lazy=True).get_field_info("einvalid", "EmuText")
+
+
+def test_schema_lazy_pickle(schema_file):
+    EMuSchema.config = None
+    EMuSchema(schema_file)
+    lazy = EMuSchema(schema_file, lazy=True)
+    lazy.get_field_info("emain", "EmuText")
+    lazy = pickle.loads(pickle.dumps(lazy))
+    modules = dict.__getitem__(lazy, "Schema")
+    assert list(dict.keys(modules)) == ["emain"]
+    # get_field_info() uses the schema class attribute, so query the copy directly
+    info = lazy[("Schema", "eref", "columns", "EmuRefOnly")]
+    assert info is lazy._index[("eref", "EmuRefOnly")]
+
+
+def test_schema_lazy_to_json(schema_file, tmp_path):
+    EMuSchema(schema_file, lazy=True).to_json(tmp_path / "schema.json")
+    assert EMuSchema(tmp_path / "schema.json") == EMuSchema(schema_file)
+
+
 def test_schema_no_args(schema_file):
     EMuSchema.config = None
     assert EMuSchema() == {}
@@ -482,6 +664,62 @@ def test_schema_getitem_not_visible(schema_file):
         EMuSchema(schema_file).get_field_info("emain", "EmuNotVisible")
 
 
+def test_schema_index(schema_file):
+    schema = EMuSchema(schema_file)
+    assert schema._index[("emain", "EmuText")] is schema.get_field_info(
+        "emain", "EmuText"
+    )
+    assert (
+        schema._index[("emain", "EmuNestedTable_nesttab_inner")]
+        is schema._index[("emain", "EmuNestedTable_nesttab")]
+    )
+    with pytest.raises(TypeError):
+        schema._index[("emain", "EmuText")] = {}
+
+
+@pytest.mark.parametrize(
+    "path,expected",
+    [
+        ("EmuRef.EmuRefOnly", "EmuRefOnly"),
+        ("EmuRef/EmuRefOnly", "EmuRefOnly"),
+        ("EmuRef_tab(+).EmuRefOnly", "EmuRefOnly"),
+        ("EmuNestedTable_nesttab_inner", "EmuNestedTable_nesttab"),
+        ("EmuTable_tab(2=)", "EmuTable_tab"),
+    ],
+)
+def test_schema_index_paths(schema_file, path, expected):
+    info = EMuSchema(schema_file).get_field_info("emain", path)
+    assert info["ColumnName"] == expected
+
+
+def test_schema_index_define_group(schema_file):
+    schema = EMuSchema(schema_file)
+    schema.define_group("emain", ["EmuText", "EmuFloat"], overwrite=True)
+    info = schema.get_field_info("emain", "EmuText")
+    assert info["GroupFields"] == ["EmuText", "EmuFloat"]
+
+
+def test_schema_index_pickle(schema_file):
+    schema = pickle.loads(pickle.dumps(EMuSchema(schema_file)))
+    assert (
+        schema._index[("emain", "EmuText")]
+        is schema[("Schema", "emain", "columns", "EmuText")]
+    )
+
+
+def test_col_batch_coercion(rec):
+    col = EMuColumn(
+        ["1970-01-01", "1970-01-01", None], module="emain", field="EmuDate0"
+    )
+    assert col == [EMuDate("1970-01-01"), EMuDate("1970-01-01"), None]
+    assert col[0] is not col[1]
+
+
+def test_col_batch_coercion_invalid(rec):
+    with pytest.raises(TypeError, match="Could not coerce to Date"):
+        EMuColumn(["1970-01-01", "Jan 1, 1970"], module="emain", field="EmuDate0")
+
+
 def test_col_change():
     col = EMuColumn(["Text"], module="emain", field="EmuTable_tab")
 
@@ -694,6 +932,53 @@ def test_rec_from_json(xml_file, output_dir, expected_rec):
     assert rec_from_json_chunked == rec_from_xml
 
 
+@pytest.mark.parametrize("chunk_size", [1, 64, 2097152])
+def test_rec_from_json_nested(xml_file, tmp_path, chunk_size):
+    records = [
+        {"irn": str(i), "EmuRef": {"irn": "1", "EmuText": "}{"}} for i in range(50)
+    ]
+    path = tmp_path / "nested.json"
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(records, f, indent=2)
+    reader = EMuReader(xml_file, json_path=path)
+    assert list(reader.from_json(chunk_size=chunk_size)) == records
+
+
+def test_rec_from_cache(xml_file_many, tmp_path):
+    expected = list(EMuReader(xml_file_many))
+    reader = EMuReader(xml_file_many, cache_path=tmp_path / "xmldata.cache")
+    assert list(reader) == expected
+    assert os.path.exists(tmp_path / "xmldata.cache")
+    assert list(reader) == expected
+    assert list(reader.from_cache(chunk_size=128)) == expected
+    assert list(reader.from_cache(start=495)) == expected[495:]
+
+
+def test_rec_from_cache_json(xml_file_many, tmp_path):
+    expected = list(EMuReader(xml_file_many))
+    reader = EMuReader(xml_file_many, cache_path=tmp_path / "xmldata.json")
+    assert list(reader) == expected
+    with open(tmp_path / "xmldata.json", encoding="utf-8") as f:
+        assert f.read(1) == "["
+
+
+def test_rec_from_cache_regenerate(xml_file_many, tmp_path):
+    path = tmp_path / "xmldata.cache"
+    with open(path, "wb") as f:
+        f.write(b"stale")
+    os.utime(path, (0, 0))
+    reader = EMuReader(xml_file_many, cache_path=path)
+    assert list(reader) == list(EMuReader(xml_file_many))
+
+
+def test_rec_from_cache_invalid(xml_file, tmp_path):
+    path = tmp_path / "xmldata.cache"
+    with open(path, "wb") as f:
+        f.write(b"x" * 100)
+    with pytest.raises(IOError, match=r"Invalid cache file"):
+        list(EMuReader(xml_file, cache_path=path).from_cache())
+
+
 def test_rec_from_zip(xml_file, output_dir, expected_rec):
     path = str(output_dir / "xmldata.zip")
     with zipfile.ZipFile(path, "w") as f:
@@ -704,6 +989,456 @@ def test_rec_from_zip(xml_file, output_dir, expected_rec):
         assert rec == expected_rec
 
 
+def test_reader_index(xml_file_many, tmp_path):
+    index_path = tmp_path / "index.json"
+    expected = list(EMuReader(xml_file_many, index_path=index_path))
+    assert os.path.exists(index_path)
+    reader = EMuReader(xml_file_many, index_path=index_path)
+    assert reader.get(250) == reader.get("250") == expected[250]
+    assert reader.seek(499) == expected[-1]
+
+
+def test_reader_index_from_zip(xml_file, output_dir, expected_rec):
+    path = str(output_dir / "xmldata_index.zip")
+    with zipfile.ZipFile(path, "w") as f:
+        f.write(xml_file, arcname="xmldata_1.xml")
+        f.write(xml_file, arcname="xmldata_2.xml")
+    reader = EMuReader(path)
+    index = reader.build_index()
+    assert len(index["records"]) == 2
+    assert reader.seek(1) == reader.get(1000000) == expected_rec
+
+
+def test_reader_index_cdata(xml_file_cdata, tmp_path):
+    index_path = tmp_path / "index.json"
+    expected = list(EMuReader(xml_file_cdata))
+    reader = EMuReader(xml_file_cdata, index_path=index_path)
+    assert len(reader.build_index()["records"]) == 4
+    assert [reader.get(i) for i in range(4)] == expected
+
+
+def test_reader_index_files_changed(xml_file_many, tmp_path):
+    path = tmp_path / "xml"
+    path.mkdir()
+    with open(xml_file_many) as f:
+        xml = f.read()
+    for i, irn in enumerate(["1", "2"]):
+        with open(path / f"xmldata_{i}.xml", "w") as f:
+            f.write(
+                xml.replace(
+                    '<atom name="irn">0</atom>', f'<atom name="irn">x{irn}</atom>'
+                )
+            )
+        os.utime(path / f"xmldata_{i}.xml", (i, i))
+    index_path = tmp_path / "index.json"
+    EMuReader(str(path), index_path=index_path).build_index()
+    # Remove the older file without changing the mtime of the newer one
+    os.remove(path / "xmldata_0.xml")
+    reader = EMuReader(str(path), index_path=index_path)
+    assert reader.seek(0)["irn"] == "x2"
+    assert len(reader._index["records"]) == 500
+
+
+def test_reader_index_from_workers(xml_file_many, tmp_path):
+    index_path = tmp_path / "index.json"
+    reader = EMuReader(xml_file_many, workers=2, chunk_size=4096, index_path=index_path)
+    expected = list(reader)
+    assert os.path.exists(index_path)
+    reader = EMuReader(xml_file_many, index_path=index_path)
+    assert reader._load_index(build=False) is not None
+    assert reader.get(250) == expected[250]
+    assert reader.seek(499) == expected[-1]
+
+
+def test_reader_index_irn_not_found(xml_file):
+    with pytest.raises(KeyError, match=r"irn not found: 1234567"):
+        EMuReader(xml_file).get(1234567)
+
+
+@pytest.mark.parametrize(
+    "fields,expected",
+    [
+        (["irn"], {"irn": "1000000"}),
+        (
+            ["irn", "EmuRef.EmuRefOnly"],
+            {"irn": "1000000", "EmuRef": {"EmuRefOnly": "Text"}},
+        ),
+        (["EmuRef_tab.irn"], {"EmuRef_tab": [{}, {}, {"irn": "1000000"}]}),
+        (
+            ["EmuRef.irn", "EmuRef"],
+            {"EmuRef": {"irn": "1000000", "EmuRefOnly": "Text"}},
+        ),
+        (
+            ["EmuDate0", "EmuNestedTable_nesttab"],
+            {
+                "EmuDate0": ["1970-01-01", "Jan 1970", "1970"],
+                "EmuNestedTable_nesttab": [None, ["Text"]],
+            },
+        ),
+    ],
+)
+def test_reader_fields(xml_file, fields, expected):
+    assert list(EMuReader(xml_file, fields=fields)) == [expected]
+
+
+@pytest.mark.parametrize("ext", [".json", ".xmuc"])
+def test_reader_fields_from_cache(xml_file, tmp_path, expected_rec, ext):
+    path = tmp_path / f"cache{ext}"
+    reader = EMuReader(xml_file, cache_path=path, fields=["irn", "EmuRef.irn"])
+    expected = {"irn": "1000000", "EmuRef": {"irn": "1000000"}}
+    assert list(reader) == list(reader) == [expected]
+    # The cache contains complete records
+    assert list(EMuReader(xml_file, cache_path=path)) == [expected_rec]
+
+
+def test_reader_fields_from_workers(xml_file_many):
+    reader = EMuReader(xml_file_many, workers=2, chunk_size=4096, fields=["irn"])
+    assert list(reader) == [{"irn": str(i)} for i in range(500)]
+
+
+@pytest.mark.parametrize(
+    "where,expected",
+    [
+        ({"irn": 250}, [250]),
+        ({"irn": "250"}, [250]),
+        ({"irn": [1, "2", 1000]}, [1, 2]),
+        ({"irn": range(10, 13)}, [10, 11, 12]),
+        ({"irn": lambda val: val.startswith("49")}, [49] + list(range(490, 500))),
+        ({"irn": 250, "EmuRef.irn": 1000000}, [250]),
+        ({"irn": 250, "EmuRef.EmuRefOnly": "Invalid"}, []),
+        ({"EmuText": "Text", "irn": range(5)}, [0, 1, 2, 3, 4]),
+        ({"EmuInvalid": None, "irn": 1}, [1]),
+    ],
+)
+def test_reader_where(xml_file_many, where, expected):
+    reader = EMuReader(xml_file_many, where=where)
+    assert [int(r["irn"]) for r in reader] == expected
+
+
+def test_reader_where_fields(xml_file_many):
+    reader = EMuReader(xml_file_many, where={"irn": 1}, fields=["EmuText"])
+    assert list(reader) == [{"EmuText": "Text"}]
+
+
+@pytest.mark.parametrize("ext", [".json", ".xmuc"])
+def test_reader_where_from_cache(xml_file_many, tmp_path, ext):
+    path = tmp_path / f"cache{ext}"
+    reader = EMuReader(xml_file_many, cache_path=path, where={"irn": range(3)})
+    assert [r["irn"] for r in reader] == [r["irn"] for r in reader] == ["0", "1", "2"]
+    # The cache contains all records
+    assert len(list(EMuReader(xml_file_many, cache_path=path))) == 500
+
+
+def test_reader_where_from_workers(xml_file_many):
+    reader = EMuReader(
+        xml_file_many, workers=2, chunk_size=4096, where={"irn": range(100, 400)}
+    )
+    assert [int(r["irn"]) for r in reader] == list(range(100, 400))
+
+
+def test_reader_where_table(xml_file):
+    with pytest.raises(ValueError, match=r"Conditions cannot be applied to tables"):
+        EMuReader(xml_file, where={"EmuTable_tab": "Text"})
+
+
+def test_reader_to_arrow(xml_file, rec):
+    pytest.importorskip("pyarrow")
+    table = EMuReader(xml_file).to_arrow()
+    assert table.to_pylist() == [
+        {
+            "irn": 1000000,
+            "EmuText": "Text",
+            "EmuFloat": 1.0,
+            "EmuLatitude": "45 30 15 N",
+            "EmuLongitude": "-130 10 5 W",
+            "EmuRef": {"irn": 1000000, "EmuRefOnly": "Text"},
+            "EmuDate0": ["1970-01-01", "Jan 1970", "1970"],
+            "EmuTime0": ["9:00", "12:00", "15:00"],
+            "EmuTable_tab": ["Text", "Text"],
+            "EmuTableUngrouped_tab": ["Text"],
+            "EmuRef_tab": [
+                {"irn": None, "EmuRefOnly": None},
+                {"irn": None, "EmuRefOnly": None},
+                {"irn": 1000000, "EmuRefOnly": "Text"},
+            ],
+            "EmuNestedTable_nesttab": [None, ["Text"]],
+        }
+    ]
+
+
+def test_reader_to_arrow_fields(xml_file, rec):
+    pa = pytest.importorskip("pyarrow")
+    table = EMuReader(xml_file, fields=["irn", "EmuRef_tab.irn"]).to_arrow()
+    assert table.schema == pa.schema(
+        [
+            ("irn", pa.int64()),
+            ("EmuRef_tab", pa.list_(pa.struct([("irn", pa.int64())]))),
+        ]
+    )
+
+
+def test_reader_to_arrow_new_field(xml_file_many, rec, tmp_path):
+    pytest.importorskip("pyarrow")
+    with open(xml_file_many) as f:
+        xml = f.read()
+    xml = xml.replace(
+        '<atom name="irn">499</atom>',
+        '<atom name="irn">499</atom><atom name="EmuNew">Text</atom>',
+    )
+    path = tmp_path / "xmldata_new_field.xml"
+    with open(path, "w") as f:
+        f.write(xml)
+    with pytest.raises(ValueError, match=r"not found in the first batch"):
+        EMuReader(str(path)).to_arrow(batch_size=100)
+
+
+def test_reader_to_parquet_new_field(xml_file_many, tmp_path):
+    pytest.importorskip("pyarrow")
+    with open(xml_file_many) as f:
+        xml = f.read()
+    xml = xml.replace(
+        '<atom name="irn">499</atom>',
+        '<atom name="irn">499</atom><atom name="EmuNew">Text</atom>',
+    )
+    path = tmp_path / "xmldata_new_field.xml"
+    with open(path, "w") as f:
+        f.write(xml)
+    parquet_path = tmp_path / "xmldata.parquet"
+    with pytest.raises(ValueError, match=r"not found in the first batch"):
+        EMuReader(str(path)).to_parquet(parquet_path, batch_size=100)
+    assert not os.path.exists(parquet_path)
+
+
+def test_reader_to_parquet(xml_file_many, rec, tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    reader = EMuReader(xml_file_many)
+    path = tmp_path / "xmldata.parquet"
+    reader.to_parquet(path, batch_size=100)
+    table = pq.read_table(path)
+    assert table.num_rows == 500
+    assert table.column("irn").to_pylist() == list(range(500))
+    assert table.equals(reader.to_arrow())
+
+
+def test_reader_shares_field_names(xml_file_many):
+    records = list(EMuReader(xml_file_many))
+    assert [id(k) for k in records[0]] == [id(k) for k in records[-1]]
+    assert [id(k) for k in records[0]["EmuRef"]] == [
+        id(k) for k in records[-1]["EmuRef"]
+    ]
+
+
+def test_reader_classifies_field_names(xml_file):
+    reader = EMuReader(xml_file)
+    list(reader)
+    kinds = {k: v[1] for k, v in reader._field_kinds.items()}
+    assert kinds["EmuRef"] != kinds["EmuRef_tab"] != kinds["EmuText"]
+    assert kinds["EmuNestedTable_nesttab"] != kinds["EmuNestedTable_nesttab_inner"]
+    assert kinds["EmuTable_tab"] == kinds["EmuText"]
+    # Names are shared with the symbol table
+    for key, (name, _) in reader._field_kinds.items():
+        assert name is reader._symbols[key]
+
+
+def test_reader_intern_values(xml_file_many):
+    records = list(EMuReader(xml_file_many, intern_values=4))
+    assert records[0]["EmuText"] is records[-1]["EmuText"]
+    assert records[0]["EmuRef_tab"][2]["EmuRefOnly"] is records[-1]["EmuText"]
+    assert records[0]["EmuLatitude"] is not records[-1]["EmuLatitude"]
+
+
+def test_reader_intern_values_bounded(xml_file_many, monkeypatch):
+    monkeypatch.setattr("xmu.io._MAX_INTERNED", 2)
+    reader = EMuReader(xml_file_many, intern_values=8)
+    records = list(reader)
+    assert len(reader._values) <= 2
+    assert not {r["irn"] for r in records} & set(reader._values)
+    assert reader._symbols.keys() == reader._field_kinds.keys()
+
+
+def test_reader_frees_records(xml_file_many):
+    sizes = []
+
+    class Reader(EMuReader):
+        def _parse(self, xml):
+            # Count the records and comments still attached to the root
+            sizes.append(len(xml.getparent()))
+            return super()._parse(xml)
+
+    records = list(Reader(xml_file_many))
+    assert len(records) == 500
+    # Only elements parsed ahead of the current record remain
+    assert max(sizes) < 100
+    assert sizes[-1] <= 3
+
+
+@pytest.mark.parametrize("chunk_size", [1, 97, 65536])
+def test_reader_chunk_size(xml_file_many, chunk_size):
+    reader = EMuReader(xml_file_many)
+    with open(xml_file_many, "rb") as source:
+        records = list(reader._iterparse(source, chunk_size=chunk_size))
+    assert records == list(EMuReader(xml_file_many))
+    assert len(records) == 500
+
+
+def test_reader_rec_class(xml_file, rec):
+    records = list(EMuReader(xml_file, rec_class=EMuRecord))
+    assert isinstance(records[0], EMuRecord)
+    assert records == [rec]
+
+
+def test_reader_rec_class_from_workers(xml_file_many):
+    expected = list(EMuReader(xml_file_many, rec_class=EMuRecord))
+    reader = EMuReader(xml_file_many, rec_class=EMuRecord, workers=2, chunk_size=4096)
+    records = list(reader)
+    assert all(isinstance(r, EMuRecord) for r in records)
+    assert records == expected
+
+
+@pytest.mark.parametrize("ext", [".json", ".xmuc"])
+def test_reader_rec_class_from_cache(xml_file, tmp_path, rec, ext):
+    path = tmp_path / f"cache{ext}"
+    reader = EMuReader(xml_file, rec_class=EMuRecord, cache_path=path)
+    assert list(reader) == list(reader) == [rec]
+    assert isinstance(list(reader)[0], EMuRecord)
+    # The cache contains raw records
+    assert list(EMuReader(xml_file, cache_path=path)) == list(EMuReader(xml_file))
+
+
+@pytest.mark.parametrize("workers", [None, 2])
+def test_reader_rec_class_compact(xml_file_many, workers):
+    reader = EMuReader(
+        xml_file_many, rec_class=EMuCompactRecord, workers=workers, chunk_size=4096
+    )
+    records = list(reader)
+    assert all(isinstance(r, EMuCompactRecord) for r in records)
+    assert [r.to_dict() for r in records] == list(EMuReader(xml_file_many))
+    assert records[0]["EmuRef.irn"] == "1000000"
+
+
+def test_coerce_records(xml_file, rec):
+    reader = EMuReader(xml_file)
+    records = list(coerce_records(reader, reader.module))
+    assert isinstance(records[0], EMuRecord)
+    assert records == [rec]
+
+
+def test_coerce_records_fields(xml_file, rec):
+    reader = EMuReader(xml_file)
+    fields = ["irn", "EmuDate0", "EmuRef.irn", "EmuRef_tab.EmuRefOnly", "EmuRef_tab"]
+    records = list(coerce_records(reader, reader.module, fields=fields))
+    assert records == [
+        EMuRecord(
+            {
+                "irn": rec["irn"],
+                "EmuDate0": rec["EmuDate0"],
+                "EmuRef": {"irn": rec["EmuRef.irn"]},
+                "EmuRef_tab": rec["EmuRef_tab"],
+            },
+            module="emain",
+        )
+    ]
+
+
+def test_coerce_records_fields_ref_tab(xml_file, rec):
+    reader = EMuReader(xml_file)
+    fields = ["EmuRef_tab.EmuRefOnly"]
+    records = list(coerce_records(reader, reader.module, fields=fields))
+    assert records[0]["EmuRef_tab"][2] == {"EmuRefOnly": "Text"}
+
+
+def test_coerce_records_ref_irn_only(rec):
+    records = [{"EmuRef": {"irn": "1000000"}}, {"EmuRef": {"irn": "\u00b2"}}]
+    coerced = coerce_records(records, "emain")
+    assert next(coerced)["EmuRef"] == 1000000
+    with pytest.raises(TypeError, match=r"Could not coerce to Integer"):
+        next(coerced)
+
+
+def test_coerce_records_invalid_field(xml_file, rec):
+    reader = EMuReader(xml_file)
+    with pytest.raises(KeyError):
+        list(coerce_records(reader, reader.module, fields=["EmuInvalid"]))
+
+
+@pytest.fixture
+def compact_rec(xml_file, rec):
+    reader = EMuReader(xml_file)
+    for rec_ in reader:
+        return EMuCompactRecord(rec_, module=reader.module)
+
+
+def test_compact_rec(compact_rec, expected_rec):
+    assert compact_rec == expected_rec
+    assert compact_rec.to_dict() == expected_rec
+    assert compact_rec.module == "emain"
+    assert compact_rec["EmuRef"].module == "eref"
+
+
+@pytest.mark.parametrize(
+    "path,expected",
+    [
+        ("irn", "1000000"),
+        ("EmuRef.irn", "1000000"),
+        ("EmuRef/EmuRefOnly", "Text"),
+        (["EmuRef", "irn"], "1000000"),
+        ("EmuTable_tab", ("Text", "Text")),
+    ],
+)
+def test_compact_rec_getitem(compact_rec, path, expected):
+    assert compact_rec[path] == expected
+
+
+@pytest.mark.parametrize("path", ["EmuInvalid", "EmuRef.EmuInvalid", "irn.irn"])
+def test_compact_rec_getitem_not_found(compact_rec, path):
+    with pytest.raises(KeyError, match=r"Path not found"):
+        compact_rec[path]
+
+
+def test_compact_rec_key_table(xml_file_many, rec):
+    reader = EMuReader(xml_file_many)
+    records = [EMuCompactRecord(r, module=reader.module) for r in reader]
+    assert len({id(r._keys) for r in records}) == 1
+    assert not hasattr(records[0], "__dict__")
+
+
+def test_compact_rec_key_table_cache(compact_rec):
+    assert cache_info()["xmu.containers._key_table"].currsize
+
+
+def test_compact_rec_key_table_schema_change(compact_rec, monkeypatch):
+    schema = EMuCompactRecord.schema
+    raw = {"irn": "1000000", "EmuRef": {"irn": "1000000"}}
+    monkeypatch.setattr(EMuCompactRecord, "schema", None)
+    assert EMuCompactRecord(raw, module="emain")["EmuRef"].module == "emain"
+    monkeypatch.setattr(EMuCompactRecord, "schema", schema)
+    assert EMuCompactRecord(raw, module="emain")["EmuRef"].module == "eref"
+
+
+def test_compact_rec_coerce_records(xml_file, compact_rec):
+    reader = EMuReader(xml_file)
+    records = list(coerce_records(reader, reader.module, rec_class=EMuCompactRecord))
+    assert records == [compact_rec]
+
+
+def test_compact_rec_to_record(compact_rec, rec):
+    assert compact_rec.to_record() == rec
+
+
+def test_compact_rec_grid(compact_rec, grid):
+    assert compact_rec.grid("EmuTable_tab").pad() == grid
+
+
+def test_compact_rec_to_xml(compact_rec, rec):
+    assert etree.tostring(compact_rec.to_xml()) == etree.tostring(rec.to_xml())
+
+
+def test_compact_rec_pickle(compact_rec):
+    unpickled = pickle.loads(pickle.dumps(compact_rec))
+    assert unpickled == compact_rec
+    assert unpickled._keys is compact_rec._keys
+
+
 def test_rec_round_trip(rec, output_dir):
     path = str(output_dir / "import.xml")
     write_import([rec], path, kind="emu")
@@ -712,6 +1447,47 @@ def test_rec_round_trip(rec, output_dir):
         assert EMuRecord(rec_, module=reader.module) == rec
 
 
+def test_rec_from_workers(xml_file_many):
+    expected = list(EMuReader(xml_file_many))
+    reader = EMuReader(xml_file_many, workers=2, chunk_size=4096)
+    assert list(reader) == expected
+    assert reader._notify_count == len(expected) == 500
+
+
+def test_rec_from_workers_unordered(xml_file_many):
+    expected = list(EMuReader(xml_file_many))
+    reader = EMuReader(xml_file_many, workers=2, ordered=False, chunk_size=4096)
+    records = sorted(reader, key=lambda rec: int(rec["irn"]))
+    assert records == expected
+
+
+def test_rec_from_workers_cdata(xml_file_cdata):
+    expected = list(EMuReader(xml_file_cdata))
+    assert len(expected) == 4
+    assert expected[1]["EmuText"] == "a<tuple>b"
+    reader = EMuReader(xml_file_cdata, workers=2, chunk_size=10)
+    assert list(reader) == expected
+
+
+def test_rec_from_workers_truncated(xml_file_cdata, tmp_path):
+    with open(xml_file_cdata) as f:
+        xml = f.read()
+    path = tmp_path / "xmldata_truncated.xml"
+    with open(path, "w") as f:
+        f.write(xml[: xml.index("<?xmu")])
+    with pytest.raises(ValueError, match=r"XML ended inside a record"):
+        list(EMuReader(str(path), workers=2, chunk_size=10))
+
+
+def test_rec_from_zip_workers(xml_file, output_dir, expected_rec):
+    path = str(output_dir / "xmldata_workers.zip")
+    with zipfile.ZipFile(path, "w") as f:
+        f.write(xml_file, arcname="xmldata_1.xml")
+        f.write(xml_file, arcname="xmldata_2.xml")
+    records = list(EMuReader(path, workers=2))
+    assert records == [expected_rec] * 2
+
+
 def test_rec_round_trip(rec, output_dir):
     path = str(output_dir / "import.xml")
     write_import([rec], path, kind="emu")
@@ -720,6 +1496,28 @@ def test_rec_round_trip(rec, output_dir):
         assert EMuRecord(rec_, module=reader.module) == rec
 
 
+def test_write_import_from_generator(rec, output_dir):
+    path = str(output_dir / "import_generator.xml")
+    write_import((rec for _ in range(3)), path, kind="emu")
+    with open(path, encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    assert lines[:4] == [
+        "<?xml version='1.0' encoding='UTF-8'?>",
+        "<!-- Data -->",
+        '<table name="emain">',
+        "  <!-- Row 1 -->",
+    ]
+    assert lines[-2:] == ["  </tuple>", "</table>"]
+    assert "  <!-- Row 3 -->" in lines
+    reader = EMuReader(path)
+    assert [EMuRecord(r, module=reader.module) for r in reader] == [rec] * 3
+
+
+def test_write_import_no_records(output_dir):
+    with pytest.raises(ValueError, match="Must provide at least one record"):
+        write_import([], str(output_dir / "import.xml"))
+
+
 def test_write_import_invalid_kind(rec, output_dir):
     with pytest.raises(ValueError, match="kind must be one of"):
         write_import([rec], str(output_dir / "import.xml"), kind="invalid")
@@ -774,13 +1572,32 @@ def test_rec_update():
         },
         module="emain",
     )
-    grid = rec.grid("EmuTable_tab")
+    # Appends include all columns in the grid, which to_xml() adds to a copy
+    grid = rec.grid("EmuTable_tab").add_columns()
     xml = etree.tostring(rec.to_xml()).decode("utf-8")
     assert xml.count('row="+"') == len(grid) * len(grid.columns)
     for row in grid:
         assert xml.count(f'group="{row.row_id()}"') == len(grid.columns)
 
 
+def test_rec_to_xml_does_not_modify():
+    rec = EMuRecord(
+        {
+            "irn": 1000000,
+            "EmuTable_tab(+)": ["Text", "Text", "Text"],
+            "EmuRef_tab(+)": [{"irn": 1000000}],
+        },
+        module="emain",
+    )
+    expected = rec.copy()
+    xml = etree.tostring(rec.to_xml(kind="update")).decode("utf-8")
+    assert rec == expected
+    assert list(rec) == ["irn", "EmuTable_tab(+)", "EmuRef_tab(+)"]
+    assert len(rec["EmuRef_tab(+)"]) == 1
+    assert xml.count("EmuDate0") == 1
+    assert xml.count('row="+"') == 12
+
+
 def test_rec_get(rec):
     assert rec.get("EmuInvalid") is None
 
@@ -1027,6 +1844,28 @@ def test_dtype_date_parse_failed():
         EMuDate("Jan 1, 1970")
 
 
+@pytest.mark.parametrize(
+    "date_string,message",
+    [
+        ("1970-1-01", "Parsing changed value"),
+        ("jan 1970", "Parsing changed value"),
+        ("0999", "Parsing changed value"),
+        ("1970-02-30", "Could not parse date"),
+        ("June 1970", "Could not parse date"),
+    ],
+)
+def test_dtype_date_parse_changed(date_string, message):
+    with pytest.raises(ValueError, match=message):
+        EMuDate(date_string)
+
+
+def test_dtype_date_parse_repeated():
+    dates = [EMuDate("Jan 1970"), EMuDate("Jan 1970")]
+    dates[0].kind = "day"
+    assert dates[1].kind == "month"
+    assert str(dates[1]) == "Jan 1970"
+
+
 def test_dtype_date_invalid_directive():
     date = EMuDate("1970-01-")
     with pytest.raises(ValueError, match='Invalid directives for "Jan 1970"'):
@@ -1069,6 +1908,35 @@ def test_dtype_time(time_string):
     assert time.minute == 0
 
 
+@pytest.mark.parametrize(
+    "time_string,expected",
+    [
+        ("9:00", "09:00"),
+        ("09:00", "09:00"),
+        ("0:00", "00:00"),
+        ("9:00:30", "09:00:30"),
+        ("0930", "09:30"),
+        ("9:00 PM", "21:00"),
+        ("9:00:30 AM", "09:00:30"),
+    ],
+)
+def test_dtype_time_format(time_string, expected):
+    assert str(EMuTime(time_string)) == expected
+
+
+@pytest.mark.parametrize(
+    "time_string,message",
+    [
+        ("9:5", "Parsing changed value"),
+        ("24:00", "Could not parse time"),
+        ("9:60", "Could not parse time"),
+    ],
+)
+def test_dtype_time_parse_failed(time_string, message):
+    with pytest.raises(ValueError, match=message):
+        EMuTime(time_string)
+
+
 @pytest.mark.parametrize(
     "val,fmt,expected",
     [
@@ -1082,6 +1950,84 @@ def test_dtype_float(val, fmt, expected):
     assert str(EMuFloat(val, fmt)) == expected
 
 
+@pytest.mark.parametrize(
+    "cls,vals",
+    [
+        (EMuDate, ["1970-01-01", "Jan 1970", "1970", "1970-01-", "1970"]),
+        (EMuTime, ["15:00", "15:00:30", "1500", "3:00 PM", "15:00", "3:00"]),
+        (EMuFloat, ["1.10", "1.", "1.10", "-0.5"]),
+        (EMuLatitude, ["45 30 15 N", "45.5", "45 30 15 N"]),
+    ],
+)
+def test_dtype_from_strings(cls, vals):
+    parsed = cls.from_strings(vals + [None, ""])
+    assert parsed[-2:] == [None, None]
+    for val, obj in zip(vals, parsed):
+        expected = cls(val)
+        assert isinstance(obj, cls)
+        assert obj.verbatim == expected.verbatim
+        assert obj.value == expected.value
+        assert str(obj) == str(expected)
+
+
+def test_dtype_from_strings_copies():
+    vals = EMuFloat.from_strings(["1.0", "1.0"])
+    vals[0] += 1
+    assert vals == [EMuFloat("2.0"), EMuFloat("1.0")]
+    coords = EMuLatitude.from_strings(["45 30 15 N", "45 30 15 N"])
+    assert coords[0].degrees is not coords[1].degrees
+
+
+def test_dtype_from_strings_invalid():
+    with pytest.raises(ValueError, match="Could not parse date:"):
+        EMuDate.from_strings(["1970-01-01", "Jan 1, 1970"])
+
+
+def test_dtype_from_strings_as_array():
+    np = pytest.importorskip("numpy")
+    ordinals, kinds = EMuDate.from_strings(["1970-01-01", "1970", None], as_array=True)
+    assert ordinals.tolist() == [719163, 719163, 0]
+    assert kinds.tolist() == ["day", "year", ""]
+    floats = EMuFloat.from_strings(["1.10", None], as_array=True)
+    assert floats[0] == 1.1
+    assert np.isnan(floats[1])
+    seconds = EMuTime.from_strings(["15:00", "1530", None], as_array=True)
+    assert seconds.dtype == np.float64
+    assert seconds[:2].tolist() == [54000.0, 55800.0]
+    assert np.isnan(seconds[2])
+    with pytest.raises(TypeError, match="cannot be converted to an array"):
+        EMuType.from_strings(["15:00"], as_array=True)
+
+
+def test_dtype_cache_copies():
+    vals = [EMuFloat("1.0"), EMuFloat("1.0")]
+    assert vals[0] is not vals[1]
+    vals[0] += 1
+    assert vals == [EMuFloat("2.0"), EMuFloat("1.0")]
+    assert str(EMuFloat("1.0")) == "1.0"
+
+
+def test_dtype_cache_copies_coords():
+    coords = [EMuLatitude("45 30 15 N"), EMuLatitude("45 30 15 N")]
+    assert coords[0].degrees is not coords[1].degrees
+    coords[0].degrees += 1
+    assert str(coords[1]) == "45 30 15 N"
+    assert str(EMuLatitude("45 30 15 N")) == "45 30 15 N"
+
+
+def test_dtype_cache_format():
+    assert str(EMuFloat("1.10")) == "1.10"
+    assert str(EMuFloat("1.10", "{:.1f}")) == "1.1"
+    assert str(EMuFloat("1.10")) == "1.10"
+
+
+def test_dtype_cache_disabled(monkeypatch):
+    monkeypatch.setattr(EMuFloat, "use_cache", False)
+    vals = [EMuFloat("1.0"), EMuFloat("1.0")]
+    vals[0] += 1
+    assert vals == [EMuFloat("2.0"), EMuFloat("1.0")]
+
+
 def test_dtype_float_format():
     val = EMuFloat("1.10")
     assert "{}".format(val) == "1.10"
@@ -1225,6 +2171,53 @@ def test_dtype_coord_out_of_bounds(coord_class, val):
         coord_class(val)
 
 
+@pytest.mark.parametrize(
+    "val",
+    [
+        EMuFloat("1.10"),
+        EMuLatitude("45 30 15 N"),
+        EMuLongitude("-45.5042"),
+        EMuDate("Jan 1970"),
+        EMuTime("15:00"),
+    ],
+)
+def test_dtype_slots(val):
+    assert not hasattr(val, "__dict__")
+    assert str(pickle.loads(pickle.dumps(val))) == str(val)
+    assert str(deepcopy(val)) == str(val)
+
+
+def test_dtype_coord_parts():
+    lat = EMuLatitude("45 30.25 N")
+    assert lat.degrees == EMuFloat("45")
+    assert str(lat.minutes) == "30.25"
+    assert lat.seconds is None
+    lat.minutes = EMuFloat("30")
+    lat.seconds = "15"
+    assert str(lat) == "45 30 15 N"
+    assert lat.kind == "dms"
+
+
+@pytest.mark.parametrize(
+    "val,expected",
+    [
+        ("45 30 15 N", 45 + 30 / 60 + 15 / 3600),
+        ("45 30.25 S", -(45 + 30.25 / 60)),
+        ("-45.5042", -45.5042),
+    ],
+)
+def test_dtype_coord_value(val, expected):
+    lat = EMuLatitude(val)
+    assert lat.value == expected
+    assert float(lat) == expected
+
+
+def test_dtype_coord_value_updated():
+    lat = EMuLatitude("45 30 N")
+    lat.minutes = "15"
+    assert float(lat) == lat.value == 45.25
+
+
 def test_dtype_coord_to_dms_too_precise():
     with pytest.raises(ValueError, match=r"unc_m cannot be smaller"):
         EMuLatitude("45 30 15 N").to_dms(1)
@@ -1396,3 +2389,52 @@ def test_mod_on_atom():
 def test_mod_invalid():
     with pytest.raises(ValueError, match=r"Invalid modifier"):
         get_mod("AtomField(*)")
+
+
+def test_cache_info():
+    info = cache_info()
+    assert {"xmu.utils.is_tab", "xmu.types._parse_date"} <= set(info)
+    hits = info["xmu.utils.is_tab"].hits
+    is_tab("EmuCacheInfo_tab")
+    is_tab("EmuCacheInfo_tab")
+    assert cache_info()["xmu.utils.is_tab"].hits == hits + 1
+    assert is_tab.cache_info() == cache_info()["xmu.utils.is_tab"]
+
+
+def test_cache_kwargs():
+    assert is_tab(field="EmuCacheKwargs_tab")
+    assert strip_mod(field="EmuCacheKwargs_tab(+)") == "EmuCacheKwargs_tab"
+
+
+def test_set_cache_size():
+    try:
+        set_cache_size(2, "xmu.utils.strip_tab")
+        for field in ["EmuA_tab", "EmuB_tab", "EmuC_tab"]:
+            strip_tab(field)
+        info = cache_info()["xmu.utils.strip_tab"]
+        assert info.maxsize == 2
+        assert info.currsize == 2
+        assert info.misses == 3
+        assert cache_info()["xmu.utils.is_tab"].maxsize != 2
+        set_cache_size(4)
+        assert {i.maxsize for i in cache_info().values()} == {4}
+    finally:
+        set_cache_size(16384)
+
+
+def test_set_cache_size_rebinds():
+    import xmu.io
+    import xmu.utils
+
+    try:
+        set_cache_size(8, "xmu.utils.is_tab")
+        assert xmu.io.is_tab is xmu.utils.is_tab
+        assert xmu.io.is_tab.cache_info().maxsize == 8
+        assert is_tab is xmu.utils.is_tab
+    finally:
+        set_cache_size(16384)
+
+
+def test_set_cache_size_not_found():
+    with pytest.raises(KeyError, match=r"Cache not found: xmu.utils.invalid"):
+        set_cache_size(10, "xmu.utils.invalid")
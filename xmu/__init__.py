@@ -1,8 +1,18 @@
 """Reads and writes XML for Axiell EMu"""
-from .containers import EMuColumn, EMuConfig, EMuGrid, EMuRow, EMuRecord, EMuSchema
+from .containers import (
+    EMuColumn,
+    EMuCompactRecord,
+    EMuConfig,
+    EMuGrid,
+    EMuRow,
+    EMuRecord,
+    EMuSchema,
+    coerce_records,
+)
 from .io import EMuReader, write_group, write_import
 from .types import EMuDate, EMuFloat, EMuLatitude, EMuLongitude, EMuTime, EMuType
 from .utils import (
+    cache_info,
     get_mod,
     has_mod,
     is_nesttab,
@@ -10,6 +20,7 @@ from .utils import (
     is_ref,
     is_ref_tab,
     is_tab,
+    set_cache_size,
     strip_mod,
     strip_tab,
 )
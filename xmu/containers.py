@@ -1,23 +1,29 @@
 """Defines containers to read and write various EMu objects"""
+import hashlib
 import json
 import logging
 import os
+import pickle
 import re
-from collections.abc import MutableMapping, MutableSequence
+import struct
+from collections.abc import Mapping, MutableMapping, MutableSequence
 from ctypes import c_uint64
 from copy import deepcopy
-from functools import lru_cache
+from itertools import chain
 from pathlib import Path
 from pprint import pformat
+from sys import intern
 from textwrap import wrap
+from types import MappingProxyType
 from warnings import warn
 
 from lxml import etree
 import yaml
 
-from .io import EMuReader
+from .io import EMuReader, _compile_fields, _project
 from .types import EMuDate, EMuFloat, EMuLatitude, EMuLongitude, EMuTime
 from .utils import (
+    _cache,
     is_ref,
     is_nesttab,
     is_nesttab_inner,
@@ -31,6 +37,39 @@ from .utils import (
 
 logger = logging.getLogger(__name__)
 
+#: re.Pattern : matches comments, key-value pairs, quoted strings, lists of
+#: integers, brackets, and barewords in a schema.pl file. Whitespace, commas,
+#: and arrows that are not part of a pair are skipped.
+_PL_TOKEN = re.compile(
+    r"[\s,;=>]*(?:#[^\n]*"
+    r"|(\w+|'[^'\\\n]*')\s*=>\s*('[^'\\\n]*'|[^\s,;'\"#=>{}\[\]()]+)"
+    r"|('(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\")"
+    r"|(\[\s*(?:[+-]?\d+\s*,\s*)*(?:[+-]?\d+\s*)?\])"
+    r"|([{}\[\]()])"
+    r"|([^\s,;'\"#=>{}\[\]()]+))"
+)
+
+#: re.Pattern : matches integers in a schema.pl file
+_PL_INT = re.compile(r"[+-]?\d+$")
+
+#: re.Pattern : matches escaped characters in a quoted string
+_PL_ESCAPE = re.compile(r"\\([\\'\"])")
+
+#: dict : classes used to coerce columns of strings in one batch by data type
+_BATCH_TYPES = {
+    "Date": EMuDate,
+    "Float": EMuFloat,
+    "Latitude": EMuLatitude,
+    "Longitude": EMuLongitude,
+    "Time": EMuTime,
+}
+
+#: bytes : identifies a binary cache file written by EMuSchema.to_cache()
+_SCHEMA_CACHE_MAGIC = b"XMUSCHEM"
+
+#: struct.Struct : magic, source digest, and table offset in a schema cache file
+_SCHEMA_CACHE_HEADER = struct.Struct("<8s20sQ")
+
 
 class EMuConfig(MutableMapping):
     """Reads and writes a configuration file
@@ -59,8 +98,9 @@ class EMuConfig(MutableMapping):
             "schema_path": (
                 "",
                 (
-                    "Path to a schema.pl file. A JSON copy of the schema will be"
-                    " created in the same directory the first time xmu is run."
+                    "Path to a schema.pl file. JSON and binary cache copies of the"
+                    " schema will be created in the same directory the first time"
+                    " xmu is run."
                 ),
             ),
             "groups": (
@@ -89,6 +129,7 @@ class EMuConfig(MutableMapping):
         EMuSchema.config = self
         EMuReader.config = self
         EMuRecord.config = self
+        EMuCompactRecord.config = self
         EMuColumn.config = self
         EMuGrid.config = self
         EMuRow.config = self
@@ -218,6 +259,10 @@ class EMuSchema(dict):
         any arguments that can be used to create a dict. If a single string,
         tries to load the dict from the path represented by that string. If
         omitted, will check the config attribute for a schema path.
+    lazy : bool
+        whether to load modules from the binary cache only when they are
+        first accessed. Has no effect if the schema is not loaded from a file
+        or if the cache is missing or out of date.
 
     Attributes
     ----------
@@ -233,7 +278,7 @@ class EMuSchema(dict):
     #: when an EMuConfig object is created.
     config = None
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, lazy=False, **kwargs):
 
         # Disable both checks for the initial read
         self.visible_only = False
@@ -246,10 +291,12 @@ class EMuSchema(dict):
                 pass
 
         self.path = None
+        self._index = MappingProxyType({})
         if len(args) == 1 and isinstance(args[0], (str, Path)):
-            self.from_file(args[0])
+            self.from_file(args[0], lazy=lazy)
         elif args or kwargs:
             super().__init__(*args, **kwargs)
+            self._build_index()
 
         # Enable both checks by default
         self.visible_only = True
@@ -258,6 +305,7 @@ class EMuSchema(dict):
         # Set schema parameter on all classes
         EMuReader.schema = self
         EMuRecord.schema = self
+        EMuCompactRecord.schema = self
         EMuColumn.schema = self
         EMuGrid.schema = self
         EMuRow.schema = self
@@ -287,6 +335,15 @@ class EMuSchema(dict):
                 ) from exc
         return obj
 
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_index"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._build_index()
+
     @property
     def modules(self):
         """Gets the list of modules in the schema"""
@@ -312,28 +369,37 @@ class EMuSchema(dict):
         except KeyError:
             return default
 
-    def from_file(self, path):
-        """Loads schema from a file, creating a JSON version if not found
+    def from_file(self, path, lazy=False):
+        """Loads schema from a file, creating JSON and cache versions if not found
+
+        The binary cache is used if it was created from the current version
+        of the schema.pl file (or the JSON file if there is no schema.pl). If
+        the cache is missing or out of date, the schema is loaded from that
+        source file and the cache is rewritten. Loading from schema.pl also
+        rewrites the JSON file.
 
         Parameters
         ----------
         path : str
             path to a schema file
+        lazy : bool
+            whether to load modules from the cache only when they are accessed
         """
         self.path = path
         path = os.path.splitext(path)[0]
+        source = f"{path}.pl" if os.path.isfile(f"{path}.pl") else f"{path}.json"
         try:
-            self.from_json(f"{path}.json")
-        except FileNotFoundError:
-            self.from_pl(f"{path}.pl")
-
-            # Map group definitions to fields prior to saving the JSON file
-            EMuRecord.schema = self
-            for module, data in self["Schema"].items():
-                for fields in data.get("groups", {}).values():
-                    self.define_group(module, fields)
-
-            self.to_json(f"{path}.json")
+            self.from_cache(f"{path}.cache", source=source, lazy=lazy)
+        except IOError as exc:
+            # The cache is stamped with the digest of the source file, so the
+            # schema must be loaded from that file, not a JSON copy that may
+            # be out of date
+            logger.info("Loading schema from %s (%s)", source, exc)
+            if source.endswith(".pl"):
+                self._from_pl_with_groups(path)
+            else:
+                self.from_json(source)
+            self._try_to_cache(f"{path}.cache", source)
 
     def from_pl(self, path):
         """Loads schema from an EMu schema.pl file
@@ -344,6 +410,7 @@ class EMuSchema(dict):
             path to a schema file
         """
         self.update(self._read_schema_pl(path))
+        self._build_index()
 
     def from_json(self, path):
         """Loads schema from JSON
@@ -355,6 +422,7 @@ class EMuSchema(dict):
         """
         with open(path, encoding="utf-8") as f:
             self.update(json.load(f))
+        self._build_index()
 
     def to_json(self, path, **kwargs):
         """Saves schema to JSON
@@ -377,6 +445,71 @@ class EMuSchema(dict):
         with open(path, "w", encoding="utf-8") as f:
             json.dump(self, f, **params)
 
+    def from_cache(self, path, source=None, lazy=False):
+        """Loads schema from a binary cache file
+
+        Parameters
+        ----------
+        path : str
+            path to a cache file written by to_cache()
+        source : str
+            path to the file used to create the cache. If given, raises an
+            IOError if the file has changed since the cache was written.
+        lazy : bool
+            whether to load each module only when it is first accessed
+        """
+        with open(path, "rb") as f:
+            table = _read_schema_cache_table(f, source)
+            if lazy:
+                modules = _LazyModules(os.path.abspath(path), table["modules"])
+            else:
+                modules = {
+                    m: _read_schema_cache_frame(f, *frame)
+                    for m, frame in table["modules"].items()
+                }
+        schema = dict(table["other"])
+        schema["Schema"] = modules
+        self.update(schema)
+        self._build_index()
+
+    def to_cache(self, path, source=None):
+        """Saves schema to a binary cache file
+
+        Each module is stored as a separate pickle. The file starts with the
+        digest of the source file and the position of a table listing the
+        offset and length of each module. Modules that have not been loaded
+        from a lazy schema are loaded before writing.
+
+        Parameters
+        ----------
+        path : str
+            path to the cache file
+        source : str
+            path to the file used to create the schema. Its digest is stored
+            in the cache so that from_cache() can tell if it has changed.
+        """
+        digest = _hash_file(source) if source else bytes(20)
+        modules = {}
+        try:
+            with open(path, "wb") as f:
+                f.write(bytes(_SCHEMA_CACHE_HEADER.size))
+                for module, data in dict.get(self, "Schema", {}).items():
+                    data = pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+                    modules[module] = (f.tell(), len(data))
+                    f.write(data)
+                table_offset = f.tell()
+                other = {k: v for k, v in self.items() if k != "Schema"}
+                table = {"modules": modules, "other": other}
+                f.write(pickle.dumps(table, protocol=pickle.HIGHEST_PROTOCOL))
+                f.seek(0)
+                f.write(
+                    _SCHEMA_CACHE_HEADER.pack(_SCHEMA_CACHE_MAGIC, digest, table_offset)
+                )
+        except KeyboardInterrupt as exc:
+            # Remove the partial cache file if write is interrupted
+            os.remove(path)
+            raise IOError("Conversion to cache failed") from exc
+
     def iterfields(self):
         """Iterates over all fields in the schema
 
@@ -422,9 +555,6 @@ class EMuSchema(dict):
             else:
                 info["GroupFields"] = fields
 
-        # Field definitions modified, so clear the cache
-        _get_field_info.cache_clear()
-
     @staticmethod
     def get_field_info(module, path, visible_only=None):
         """Gets data about the field specified by a path
@@ -447,9 +577,50 @@ class EMuSchema(dict):
             path = ".".join(path)
         return _get_field_info(module, path, visible_only=visible_only)
 
+    def _build_index(self):
+        """Builds a flat index of field info keyed to (module, field)
+
+        The index points to the same dicts as the schema, so changes made to
+        field info (for example, by define_group()) are reflected in both.
+        Inner nested tables are indexed under the name of their parent table.
+        Only modules that have already been loaded are included.
+        """
+        index = {}
+        modules = dict.get(self, "Schema", {})
+        for module, data in dict.items(modules):
+            _index_module(index, module, data)
+
+        # Modules in a lazy schema add themselves to the index when loaded
+        if isinstance(modules, _LazyModules):
+            modules.index = index
+
+        self._index = MappingProxyType(index)
+
+    def _from_pl_with_groups(self, path):
+        """Loads schema.pl, maps groups to fields, and saves a JSON copy"""
+        self.from_pl(f"{path}.pl")
+
+        # Map group definitions to fields prior to saving the JSON file
+        EMuRecord.schema = self
+        for module, data in self["Schema"].items():
+            for fields in data.get("groups", {}).values():
+                self.define_group(module, fields)
+
+        self.to_json(f"{path}.json")
+
+    def _try_to_cache(self, path, source):
+        """Saves schema to a binary cache file if the location is writable"""
+        try:
+            self.to_cache(path, source=source)
+        except OSError as exc:
+            logger.warning("Could not write schema cache to %s (%s)", path, exc)
+
     def _read_schema_pl(self, path):
         """Reads an EMu schema file
 
+        The file is tokenized in a single pass, with containers tracked on a
+        stack as they are opened and closed.
+
         Parameters
         ----------
         path : str
@@ -460,58 +631,68 @@ class EMuSchema(dict):
         dict
             EMu schema
         """
-        schema = {"Schema": {}}
-        dct = schema["Schema"]
-        keypath = ["Schema"]
-        items = []
         with open(path, encoding="utf-8") as f:
-            for line in f:
-                line = line.strip().strip(",")
-
-                # Open new child dictionary when line ends with an arrow
-                if line.endswith("=>"):
-                    key = line.rsplit("=>")[0].strip().strip("'")
-                    keypath.append(key)
-                    dct[key] = {}
-                    dct = dct[key]
-
-                # Add new key-val when arrow occurs mid-line
-                elif "=>" in line:
-                    key, val = [s.strip().strip("'") for s in line.split("=>")]
-                    dct[key] = self._parse_value(val)
-
-                # Open a new list
-                elif line == "[":
-                    items.append([])
-
-                # Set list as the value for the current key
-                elif line == "]" and len(items) == 1:
-                    last = keypath.pop(-1)
-                    dct = schema
-                    for key in keypath:
-                        dct = dct[key]
-                    dct[last] = items.pop(-1)
-
-                # Append nested list to previous item in the lists container
-                elif line == "]":
-                    items[-2].append(items.pop(-1))
-
-                # Append value to the current list
-                elif items:
-                    vals = self._parse_value(line)
-                    if line.startswith("[") or isinstance(vals, (str, int)):
-                        items[-1].append(vals)
+            text = f.read()
+
+        # Skip to the hash assigned to %Schema
+        match = re.search(r"%Schema\s*=\s*\(", text)
+        pos = match.end() if match else len(text)
+
+        dct = {}
+        stack = [dct]
+        key = None
+        for pair_key, pair_val, quoted, ints, bracket, word in _PL_TOKEN.findall(
+            text, pos
+        ):
+            # Most of the file consists of key-value pairs on a single line
+            if pair_key:
+                if pair_key[0] == "'":
+                    pair_key = pair_key[1:-1]
+                stack[-1][intern(pair_key)] = _parse_pl_scalar(pair_val)
+                continue
+
+            obj = stack[-1]
+
+            if bracket:
+                # Open a child dict or list
+                if bracket == "{" or bracket == "[":
+                    child = {} if bracket == "{" else []
+                    if isinstance(obj, list):
+                        obj.append(child)
                     else:
-                        items[-1].extend(vals)
+                        obj[key] = child
+                        key = None
+                    stack.append(child)
+                # Go up one level, stopping when the %Schema hash is closed
+                elif bracket != "(":
+                    stack.pop()
+                    if not stack:
+                        break
+                continue
+
+            # Lists of integers on a single line are parsed all at once
+            if ints:
+                val = [int(i) for i in ints[1:-1].split(",") if i and not i.isspace()]
+            else:
+                # Skip comments
+                val = quoted or word
+                if not val:
+                    continue
+
+                # Keys are always strings
+                if key is None and not isinstance(obj, list):
+                    key = intern(_parse_pl_scalar(val) if quoted else val)
+                    continue
 
-                # Go up one level in the dictionary
-                elif line == "}":
-                    keypath.pop(-1)
-                    dct = schema
-                    for key in keypath:
-                        dct = dct[key]
+                val = _parse_pl_scalar(val)
+
+            if isinstance(obj, list):
+                obj.append(val)
+            else:
+                obj[key] = val
+                key = None
 
-        return schema
+        return {"Schema": dct}
 
     def _get_similar_keys(self, path):
         """Finds fields similar to the one at the end of the given path"""
@@ -521,15 +702,94 @@ class EMuSchema(dict):
             obj = obj[key]
         return [k for k in obj if k.startswith(last)]
 
-    @staticmethod
-    def _parse_value(val):
-        """Parses strings, lists, and integers from perl file"""
-        vals = val.strip("[]").split(",")
+
+class _LazyModules(dict):
+    """Loads modules from a schema cache file when they are first accessed
+
+    Module names are available without loading the modules themselves.
+    Methods that return values (items, values, and comparisons) load every
+    module first.
+
+    Parameters
+    ----------
+    path : str
+        path to the schema cache file
+    frames : dict
+        offset and length of each module in the cache file
+
+    Attributes
+    ----------
+    index : dict
+        flat index of field info that modules are added to as they are loaded
+    """
+
+    def __init__(self, path, frames):
+        super().__init__()
+        self.path = path
+        self.frames = frames
+        self.index = {}
+
+    def __reduce__(self):
+        # Pickle only the modules that have been loaded
+        return (
+            self.__class__,
+            (self.path, self.frames),
+            None,
+            None,
+            iter(dict.items(self)),
+        )
+
+    def __missing__(self, key):
         try:
-            vals = [int(s.strip()) for s in vals]
-        except ValueError:
-            vals = [s.strip("'").strip() for s in vals]
-        return vals if "," in val else vals[0]
+            frame = self.frames[key]
+        except KeyError:
+            raise KeyError(key) from None
+        with open(self.path, "rb") as f:
+            data = _read_schema_cache_frame(f, *frame)
+        logger.debug("Loaded %s from schema cache", key)
+        dict.__setitem__(self, key, data)
+        _index_module(self.index, key, data)
+        return data
+
+    def __contains__(self, key):
+        return key in self.frames or dict.__contains__(self, key)
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def __eq__(self, other):
+        self._load_all()
+        return dict.__eq__(self, other)
+
+    def __ne__(self, other):
+        self._load_all()
+        return dict.__ne__(self, other)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self):
+        return dict.fromkeys(chain(self.frames, dict.keys(self))).keys()
+
+    def items(self):
+        self._load_all()
+        return dict.items(self)
+
+    def values(self):
+        self._load_all()
+        return dict.values(self)
+
+    def _load_all(self):
+        """Loads all modules that have not been loaded yet"""
+        for key in self.frames:
+            if not dict.__contains__(self, key):
+                self.__missing__(key)
 
 
 class EMuColumn(list):
@@ -600,7 +860,7 @@ class EMuColumn(list):
         super().append(_coerce_values(self, val))
 
     def extend(self, vals):
-        super().extend([_coerce_values(self, v) for v in vals])
+        super().extend(_coerce_column(self, vals))
 
     def to_xml(self, root=None, kind=None, row_ids=None):
         """Converts column to XML formatted for EMu
@@ -1090,7 +1350,8 @@ class EMuRecord(dict):
     def to_xml(self, root=None, kind=None):
         """Converts record to XML formatted for EMu
 
-        Normally called without specifying arguments.
+        Normally called without specifying arguments. Does not modify the
+        record, so records do not need to be copied before calling.
 
         Parameters
         ----------
@@ -1119,15 +1380,18 @@ class EMuRecord(dict):
         if kind is None:
             kind = "update" if "irn" in self else "import"
 
-        # Fill in grids and cache row IDs so grids are only checked once
+        # Fill in grids and cache row IDs so grids are only checked once. Grids
+        # are filled in a shallow copy so that the original is not modified.
+        rec = self
         grids = {}
         if kind == "update":
-            for key in list(self):
+            rec = _shallow_copy(self)
+            for key in list(rec):
                 try:
                     grids[key]
                 except KeyError:
                     try:
-                        grid = self.grid(key)
+                        grid = rec.grid(key)
                     except KeyError:
                         pass
                     else:
@@ -1139,7 +1403,7 @@ class EMuRecord(dict):
                         for col in grid.columns:
                             grids[col] = row_ids
 
-        for key, val in self.items():
+        for key, val in rec.items():
             if is_tab(key):
                 # If field is part of a grid, pass row identifiers to the
                 # EMuColumn to_xml() method. These will be used to populate the
@@ -1160,6 +1424,310 @@ class EMuRecord(dict):
         return root
 
 
+class EMuCompactRecord(Mapping):
+    """Stores an EMu record in a compact, read-only form
+
+    Intended for holding large numbers of records in memory. Field names are
+    interned and stored in a key table shared by every record from the same
+    module with the same fields, and values are stored in a tuple. Nested
+    references are stored as compact records and tables as tuples. Values are
+    stored as given and are not coerced. Use to_record() to convert to an
+    EMuRecord. Records from an EMuReader can be converted in bulk using
+    coerce_records() with rec_class=EMuCompactRecord.
+
+    Parameters
+    ----------
+    rec : mapping
+        record as a mapping
+    module : str
+        backend name of an EMu module
+
+    Attributes
+    ----------
+    module : str
+        backend name of an EMu module
+    """
+
+    __slots__ = ("_keys", "_values")
+
+    #: EMuConfig : module-wide configuration parameters. Set automatically
+    #: when an EMuConfig object is created.
+    config = None
+
+    #: EMuSchema : info about a specific EMu configuration. Set automatically
+    #: when an EMuSchema object is created.
+    schema = None
+
+    def __init__(self, rec=None, module=None):
+        if rec is None:
+            rec = {}
+        keys = self._get_key_table(module, tuple(rec))
+        self._keys = keys
+        self._values = tuple(
+            _compact_value(v, keys.ref_modules.get(k, module)) for k, v in rec.items()
+        )
+
+    def __str__(self):
+        return f"{self.__class__.__name__}({pformat(dict(self))})"
+
+    def __repr__(self):
+        return str(self)
+
+    def __getitem__(self, path):
+        try:
+            return self._values[self._keys.positions[path]]
+        except KeyError:
+            pass
+        except TypeError:
+            # Lists and tuples are not hashable
+            pass
+
+        path = _split_path(path)
+        obj = self
+        try:
+            for key in path:
+                if isinstance(obj, EMuCompactRecord):
+                    obj = obj._values[obj._keys.positions[key]]
+                else:
+                    obj = obj[key]
+        except (IndexError, KeyError, TypeError) as exc:
+            dotpath = ".".join((str(p) for p in path))
+            raise KeyError(
+                f"Path not found: {dotpath} (module={self.module}) (failed at {key})"
+            ) from exc
+        return obj
+
+    def __eq__(self, other):
+        if isinstance(other, EMuCompactRecord):
+            return self._keys.keys == other._keys.keys and self._values == other._values
+        if isinstance(other, Mapping):
+            return self.to_dict() == dict(other)
+        return NotImplemented
+
+    def __contains__(self, key):
+        try:
+            return key in self._keys.positions
+        except TypeError:
+            return False
+
+    def __iter__(self):
+        return iter(self._keys.keys)
+
+    def __len__(self):
+        return len(self._values)
+
+    def __reduce__(self):
+        return (_compact_record, (self.module, self._keys.keys, self._values))
+
+    @property
+    def module(self):
+        """Gets the backend name of the EMu module"""
+        return self._keys.module
+
+    def to_dict(self):
+        """Converts the record to a dict
+
+        Returns
+        -------
+        dict
+            record with references as dicts and tables as lists
+        """
+        return {k: _expand_value(v) for k, v in zip(self._keys.keys, self._values)}
+
+    def to_record(self, rec_class=None):
+        """Converts the record to an EMuRecord
+
+        Parameters
+        ----------
+        rec_class : type
+            class used to create the record. Defaults to EMuRecord.
+
+        Returns
+        -------
+        EMuRecord
+            record with values coerced using the schema
+        """
+        if rec_class is None:
+            rec_class = EMuRecord
+        return rec_class(self.to_dict(), module=self.module)
+
+    def grid(self, field, **kwargs):
+        """Returns the EMuGrid object containing the given field
+
+        The grid is built from a copy of the record converted using
+        to_record(), so changes to the grid do not affect this record.
+
+        Parameters
+        ----------
+        field : str
+            any field name that appears in a grid
+        kwargs :
+            keyword agruments for EMuGrid
+
+        Returns
+        -------
+        EMuGrid
+            the grid from a copy of the current record
+        """
+        return self.to_record().grid(field, **kwargs)
+
+    def to_xml(self, root=None, kind=None):
+        """Converts record to XML formatted for EMu
+
+        See EMuRecord.to_xml() for details.
+
+        Parameters
+        ----------
+        root : lxml.etree.Element or SubElement
+            parent element in the XML tree
+        kind : str
+           kind of XML file. One of "import", "update", or "emu".
+
+        Returns
+        -------
+        lxml.etree.Element or SubElement
+            record as XML
+        """
+        return self.to_record().to_xml(root=root, kind=kind)
+
+    @classmethod
+    def _get_key_table(cls, module, keys):
+        """Gets the shared key table for a module and set of keys
+
+        Key tables are kept in a bounded cache. The modules for references
+        are looked up again if the schema has changed since the table was
+        last used.
+        """
+        table = _key_table(module, keys)
+        if table.schema is not cls.schema:
+            table.resolve(cls.schema)
+        return table
+
+
+class _KeyTable:
+    """Maps field names to positions for records that share the same fields
+
+    Parameters
+    ----------
+    module : str
+        backend name of an EMu module
+    keys : tuple of str
+        field names in the order they appear in the record
+
+    Attributes
+    ----------
+    module : str
+        backend name of an EMu module
+    keys : tuple of str
+        field names in the order they appear in the record
+    positions : dict
+        position of each field in the values tuple
+    ref_modules : dict
+        module for each reference in the record
+    schema : EMuSchema
+        schema used to find the module for each reference
+    """
+
+    __slots__ = ("module", "keys", "positions", "ref_modules", "schema")
+
+    def __init__(self, module, keys):
+        self.module = module
+        self.keys = keys
+        self.positions = {k: i for i, k in enumerate(keys)}
+        self.ref_modules = {}
+        self.schema = None
+
+    def resolve(self, schema):
+        """Finds the module for each reference using the given schema
+
+        Parameters
+        ----------
+        schema : EMuSchema
+            schema used to find the module for each reference
+        """
+        ref_modules = {}
+        if schema is not None and self.module is not None:
+            for key in self.keys:
+                if is_ref(key):
+                    try:
+                        info = schema.get_field_info(
+                            self.module, key, visible_only=False
+                        )
+                        ref_modules[key] = info["RefTable"]
+                    except KeyError:
+                        pass
+        self.ref_modules = ref_modules
+        self.schema = schema
+
+
+def coerce_records(records, module, fields=None, rec_class=None):
+    """Coerces raw records, optionally limiting each record to certain fields
+
+    Intended for records read by an EMuReader using the default rec_class,
+    so that values are only coerced for records and fields that are used.
+
+    Parameters
+    ----------
+    records : iterable of dict
+        raw records, for example, from an EMuReader
+    module : str
+        backend name of an EMu module
+    fields : list of str
+        paths to the fields to include in each record, for example,
+        "EmuRef.irn". If omitted, all fields are included.
+    rec_class : type
+        class used to create each record. Defaults to EMuRecord.
+
+    Yields
+    ------
+    EMuRecord
+        EMu record containing the selected fields
+    """
+    if rec_class is None:
+        rec_class = EMuRecord
+
+    tree = None
+    if fields is not None:
+        tree = _compile_fields(fields)
+
+        # Validate the paths once for the whole batch
+        schema = rec_class.schema
+        if schema is not None and schema.validate_paths:
+            for field in fields:
+                schema.get_field_info(module, field)
+
+    for rec in records:
+        if tree is not None:
+            rec = _project(rec, tree)
+        yield rec_class(rec, module=module)
+
+
+def _coerce_column(parent, vals):
+    """Coerces a list of values being added to a column
+
+    Columns of strings in Date, Float, Latitude, Longitude, and Time fields are
+    parsed in one batch using the from_strings() method for that type, which
+    parses each distinct value once. Other values are coerced one at a time.
+    """
+    if not isinstance(vals, (list, tuple)):
+        vals = list(vals)
+    if (
+        len(vals) > 1
+        and parent.schema
+        and parent.schema.validate_paths
+        and all((v is None or v and isinstance(v, str) for v in vals))
+    ):
+        field_info = parent.schema.get_field_info(parent.module, parent.field)
+        cls = _BATCH_TYPES.get(field_info["DataType"])
+        if cls is not None:
+            try:
+                return cls.from_strings(vals)
+            except (TypeError, ValueError):
+                # Coerce values individually to get the standard error
+                pass
+    return [_coerce_values(parent, v) for v in vals]
+
+
 def _coerce_values(parent, child, key=None):
     """Coerces child containers and values to specific classes"""
 
@@ -1189,7 +1757,13 @@ def _coerce_values(parent, child, key=None):
     if is_ref(field):
         # Simplify IRN-only references to integers
         if isinstance(child, dict) and list(child) == ["irn"]:
-            child = child["irn"]
+            irn = child["irn"]
+            # IRNs in raw records read from XML are strings. Use isdecimal()
+            # because isdigit() accepts characters that int() cannot parse.
+            if isinstance(irn, str) and irn.isdecimal():
+                irn = int(irn)
+            if isinstance(irn, int):
+                child = irn
 
         # Interpret integers in reference fields as IRNs
         if isinstance(child, int):
@@ -1276,21 +1850,61 @@ def _coerce_values(parent, child, key=None):
     return child
 
 
-@lru_cache(maxsize=None)
+@_cache()
+def _key_table(module, keys):
+    """Creates a key table shared by records with the same module and keys"""
+    return _KeyTable(module, tuple(intern(k) for k in keys))
+
+
+def _compact_record(module, keys, values):
+    """Recreates a compact record when unpickling"""
+    rec = EMuCompactRecord.__new__(EMuCompactRecord)
+    rec._keys = EMuCompactRecord._get_key_table(module, keys)
+    rec._values = values
+    return rec
+
+
+def _compact_value(val, module):
+    """Converts references and tables for use in a compact record"""
+    if isinstance(val, Mapping):
+        return EMuCompactRecord(val, module=module)
+    if isinstance(val, (list, tuple)):
+        return tuple((_compact_value(v, module) for v in val))
+    return val
+
+
+def _expand_value(val):
+    """Converts references and tables from a compact record to dicts and lists"""
+    if isinstance(val, EMuCompactRecord):
+        return val.to_dict()
+    if isinstance(val, tuple):
+        return [_expand_value(v) for v in val]
+    return val
+
+
 def _get_field_info(module, path, visible_only=None):
     """Gets field info from a schema for a given module and path
 
-    Moved outside of EMuSchema to allow use of lru_cache.
+    Each segment is looked up in the flat index built when the schema is
+    loaded, following RefTable to the next module. Segments missing from the
+    index fall back to the full schema so that the usual errors are raised.
     """
     schema = EMuRecord.schema
 
     if visible_only is None:
         visible_only = schema.visible_only
 
-    for seg in _split_path(path):
-        obj = schema[
-            ("Schema", module, "columns", strip_mod(seg).replace("_inner", ""))
-        ]
+    index = schema._index
+    segs = path.split(".") if "/" not in path else _split_path(path)
+    for seg in segs:
+        try:
+            obj = index[(module, seg)]
+        except KeyError:
+            seg = strip_mod(seg)
+            try:
+                obj = index[(module, seg)]
+            except KeyError:
+                obj = schema[("Schema", module, "columns", seg.replace("_inner", ""))]
         module = obj.get("RefTable", module)
 
     # ItemName *appears* to be populated only for fields that appear in the client
@@ -1300,6 +1914,90 @@ def _get_field_info(module, path, visible_only=None):
     return obj
 
 
+def _parse_pl_scalar(val):
+    """Parses a quoted string, integer, or bareword from a schema.pl file"""
+    if val[0] == "'" or val[0] == '"':
+        val = val[1:-1]
+        return intern(_PL_ESCAPE.sub(r"\1", val) if "\\" in val else val)
+    return int(val) if _PL_INT.match(val) else intern(val)
+
+
+def _hash_file(path):
+    """Calculates the SHA-1 digest of a file"""
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1048576), b""):
+            digest.update(block)
+    return digest.digest()
+
+
+def _read_schema_cache_table(f, source=None):
+    """Validates a schema cache file and reads its table of modules
+
+    Parameters
+    ----------
+    f : file-like
+        schema cache file opened for reading
+    source : str
+        path to the file used to create the cache
+
+    Returns
+    -------
+    dict
+        offset and length of each module and any top-level keys besides Schema
+    """
+    try:
+        magic, digest, table_offset = _SCHEMA_CACHE_HEADER.unpack(
+            f.read(_SCHEMA_CACHE_HEADER.size)
+        )
+    except struct.error as exc:
+        raise IOError(f"Invalid cache file: {f.name}") from exc
+    if magic != _SCHEMA_CACHE_MAGIC:
+        raise IOError(f"Invalid cache file: {f.name}")
+    if source is not None and digest != _hash_file(source):
+        raise IOError(f"Cache file is out of date: {f.name}")
+    f.seek(table_offset)
+    try:
+        return pickle.load(f)
+    except (EOFError, ValueError, pickle.UnpicklingError) as exc:
+        raise IOError(f"Invalid cache file: {f.name}") from exc
+
+
+def _read_schema_cache_frame(f, offset, length):
+    """Reads a single module from a schema cache file"""
+    f.seek(offset)
+    try:
+        return pickle.loads(f.read(length))
+    except (EOFError, ValueError, pickle.UnpicklingError) as exc:
+        raise IOError(f"Invalid cache file: {f.name}") from exc
+
+
+def _index_module(index, module, data):
+    """Adds the fields in a module to a flat index of field info"""
+    for field, info in data.get("columns", {}).items():
+        index[(module, field)] = info
+        if is_nesttab(field):
+            index[(module, f"{field}_inner")] = info
+
+
+def _shallow_copy(obj):
+    """Copies a record or column without copying or coercing its values
+
+    Columns in a record are also copied so that they can be padded or extended
+    without modifying the original.
+    """
+    copy_ = obj.__class__.__new__(obj.__class__)
+    copy_.__dict__.update(obj.__dict__)
+    if isinstance(obj, dict):
+        for key, val in obj.items():
+            if isinstance(val, list):
+                val = _shallow_copy(val)
+            dict.__setitem__(copy_, key, val)
+    else:
+        list.extend(copy_, obj)
+    return copy_
+
+
 def _get_module(obj):
     """Gets module name"""
     if obj.schema is not None and obj.field is not None and is_ref(obj.field):
@@ -3,9 +3,19 @@ import datetime as dt
 import glob
 import json
 import logging
+import operator
 import os
+import pickle
+import re
+import struct
 import time
 import zipfile
+from array import array
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from functools import partial
+from io import BytesIO
+from itertools import chain, islice
 
 from lxml import etree
 
@@ -24,6 +34,45 @@ class EMuReader:
         path to a file or directory
     json_path : str or Path
         path to a JSON file used to cache records for faster reading
+    workers : int
+        number of processes to use when reading XML. If omitted or 1, records
+        are read in the current process.
+    ordered : bool
+        whether records read by multiple workers are yielded in the same order
+        as they appear in the source files
+    chunk_size : int
+        approximate size in bytes of each block of records sent to a worker
+    index_path : str or Path
+        path to a JSON file used to store the location of each record
+    cache_path : str or Path
+        path to a file used to cache records for faster reading. The format
+        is determined by the file extension. Takes precedence over json_path.
+    rec_class : type
+        class used to create each record from a raw record and the module
+        name, for example, EMuRecord or EMuCompactRecord. The default, dict,
+        yields raw records without validating or coercing values, which is
+        much faster than using EMuRecord. Raw records can be coerced later,
+        for example, after filtering, using coerce_records().
+    fields : list of str
+        paths to the fields to include in each record, for example,
+        "EmuRef.irn". Other fields are skipped when parsing XML. If omitted,
+        all fields are included.
+    where : dict
+        conditions that a record must meet to be read, keyed to the path of
+        an atomic field or a field in a reference, for example, "EmuRef.irn".
+        Conditions are checked before the rest of the record is parsed.
+        Conditions can be a value (matches if equal), a list, tuple, or set
+        (matches any value), a range (matches integers in the range), or a
+        function that accepts the text of the field (or None if the field is
+        missing or empty) and returns a bool, for example, to match prefixes
+        or ranges of dates. Functions must be picklable if using workers.
+    intern_values : int
+        maximum length of atomic values to share between records. Values up
+        to this length, like terms from lookup lists, are stored in a table
+        of values for the reader so that each repeat uses the same string.
+        IRNs are never shared. The table is emptied whenever it holds 16,384
+        values, so unique values cannot make it grow without limit. If 0,
+        only field names are shared.
 
     Attributes
     ----------
@@ -31,6 +80,22 @@ class EMuReader:
         path to a file or directory
     json_path : str or Path
         path to a JSON file used to cache records for faster reading
+    workers : int
+        number of processes to use when reading XML
+    ordered : bool
+        whether records read by multiple workers are yielded in order
+    chunk_size : int
+        approximate size in bytes of each block of records sent to a worker
+    index_path : str or Path
+        path to a JSON file used to store the location of each record
+    cache_path : str or Path
+        path to a file used to cache records for faster reading
+    fields : list of str
+        paths to the fields to include in each record
+    where : dict
+        conditions that a record must meet to be read
+    intern_values : int
+        maximum length of atomic values to share between records
     files : list
         list of file-like objects, each of which is an EMu XML file
     module : str
@@ -45,12 +110,43 @@ class EMuReader:
     #: when an EMuSchema object is created.
     schema = None
 
-    def __init__(self, path, json_path=None):
+    #: dict : names of the methods used to write and read a cache file for
+    #: each file extension. Other extensions use the binary cache format.
+    cache_formats = {".json": ("to_json", "from_json")}
+
+    def __init__(
+        self,
+        path,
+        json_path=None,
+        workers=None,
+        ordered=True,
+        chunk_size=4194304,
+        index_path=None,
+        cache_path=None,
+        rec_class=dict,
+        fields=None,
+        where=None,
+        intern_values=0,
+    ):
         self.path = path
-        self._rec_class = dict
+        self._rec_class = rec_class
+        self.fields = fields
+        self._field_tree = _compile_fields(fields) if fields else None
+        self.where = where
+        self._conditions = _compile_where(where) if where else None
+        self.intern_values = intern_values
+        self._symbols = {}
+        self._field_kinds = _FieldKinds(self._symbols)
+        self._values = {}
         self.json_path = json_path
+        self.workers = workers
+        self.ordered = ordered
+        self.chunk_size = chunk_size
+        self.index_path = index_path
+        self.cache_path = cache_path
         self.files = []
         self.module = None
+        self._index = None
         self._get_files()
         self._load_schema()
 
@@ -64,27 +160,41 @@ class EMuReader:
         for rec in self.from_file():
             yield rec
 
+    def __getstate__(self):
+        # Zip files cannot be pickled, so workers get data instead of files
+        state = self.__dict__.copy()
+        state["files"] = []
+        state["_index"] = None
+        state["_symbols"] = {}
+        state["_field_kinds"] = _FieldKinds(state["_symbols"])
+        state["_values"] = {}
+        return state
+
     def from_file(self):
-        """Reads data from file, using JSON if possible
+        """Reads data from file, using a cache file if possible
 
         Yields
         ------
         dict
             EMu record
         """
-        if not self.json_path:
+        path = self.cache_path if self.cache_path else self.json_path
+        if not path:
             return self.from_xml()
 
-        # If JSON is older than the newest XML file, regenerate it
+        ext = os.path.splitext(str(path))[-1].lower()
+        write, read = self.cache_formats.get(ext, ("to_cache", "from_cache"))
+
+        # If cache is older than the newest XML file, regenerate it
         try:
-            if os.path.getmtime(self.json_path) < self.files[-1].getmtime():
-                logger.info("Regenerating JSON (XML is newer)")
-                self.to_json()
+            if os.path.getmtime(path) < self.files[-1].getmtime():
+                logger.info("Regenerating cache (XML is newer)")
+                getattr(self, write)(path)
         except FileNotFoundError:
-            logger.info("Generating JSON (JSON not found)")
-            self.to_json()
+            logger.info("Generating cache (cache not found)")
+            getattr(self, write)(path)
 
-        return self.from_json()
+        return getattr(self, read)(path=path)
 
     def from_xml(self):
         """Reads data from XML
@@ -94,6 +204,16 @@ class EMuReader:
         dict
             EMu record
         """
+        # Record the location of each record if the index needs to be built
+        index = None
+        if self.index_path and self._load_index(build=False) is None:
+            logger.info("Building index at %s", self.index_path)
+            index = self._new_index()
+
+        if self.workers and self.workers > 1:
+            yield from self._from_xml_parallel(index)
+            return
+
         for filelike in self.files:
             logger.info("Reading records from %s", filelike)
             self._job_start = None
@@ -101,78 +221,166 @@ class EMuReader:
             self._notify_start = None
             self._notify_count = 0
             with filelike.open("rb") as source:
-                try:
-                    context = etree.iterparse(source, events=["end"], tag="tuple")
-                    for _, element in context:
-                        # Process children of module table only
-                        parent = element.getparent().get("name")
-                        if parent is not None and parent.startswith("e"):
-                            try:
-                                yield self._parse(element)
-                            finally:
-                                element.clear()
-                                # while element.getprevious() is not None:
-                                #    del element.getparent()[0]
-                                self._notify_count += 1
-                                if not self._notify_count % 5000:
-                                    logger.info(
-                                        "Read %s records from %s",
-                                        self._notify_count,
-                                        filelike,
-                                    )
-                finally:
-                    del context
+                if index is not None:
+                    source = _IndexingStream(source)
+                for rec in self._iterparse(source):
+                    try:
+                        yield rec
+                    finally:
+                        self._notify_count += 1
+                        if not self._notify_count % 5000:
+                            logger.info(
+                                "Read %s records from %s",
+                                self._notify_count,
+                                filelike,
+                            )
             logger.info("Read %s records total", self._notify_count)
             if self._job_start:
                 self.report_progress()
+            if index is not None:
+                self._add_to_index(index, filelike, source.records)
 
-    def from_json(self, chunk_size=2097152):
+        if index is not None:
+            self._save_index(index)
+
+    def get(self, irn):
+        """Reads the record with the given irn using the index
+
+        Parameters
+        ----------
+        irn : int or str
+            the irn of a record
+
+        Returns
+        -------
+        dict
+            EMu record
+        """
+        index = self._load_index()
+        try:
+            return self.seek(index["irns"][str(irn)])
+        except KeyError as exc:
+            raise KeyError(f"irn not found: {irn}") from exc
+
+    def seek(self, n):
+        """Reads the nth record using the index
+
+        Parameters
+        ----------
+        n : int
+            position of the record across all source files, starting from 0
+
+        Returns
+        -------
+        dict
+            EMu record
+        """
+        index = self._load_index()
+        file_index, offset, length, _ = index["records"][n]
+        with self.files[file_index].open("rb") as f:
+            f.seek(offset)
+            return self._parse(etree.fromstring(f.read(length)))
+
+    def build_index(self, path=None):
+        """Builds an index of the location of each record in the source files
+
+        The index is built without parsing records. Use from_xml() to build
+        the index while reading records instead.
+
+        Parameters
+        ----------
+        path : str
+            path to save the index as JSON. Defaults to index_path.
+
+        Returns
+        -------
+        dict
+            the index
+        """
+        if path is None:
+            path = self.index_path
+        index = self._new_index()
+        for filelike in self.files:
+            logger.info("Indexing records in %s", filelike)
+            with filelike.open("rb") as source:
+                stream = _IndexingStream(source)
+                while stream.read(65536):
+                    pass
+            self._add_to_index(index, filelike, stream.records)
+        self._save_index(index, path)
+        return index
+
+    def from_json(self, chunk_size=2097152, path=None):
         """Reads data from JSON
 
         Parameters
         ----------
         chunk_size : int
             size of chunk to use when reading the file
+        path : str
+            path to the JSON file. Defaults to json_path.
 
         Yields
         ------
         dict
             EMu record
         """
-        logger.info("Reading records from %s", self.json_path)
+        if path is None:
+            path = self.json_path
+        logger.info("Reading records from %s", path)
         self._job_start = None
         self._job_done = False
         self._notify_start = None
         self._notify_count = 0
-        with open(self.json_path, encoding="utf-8") as f:
-            f.read(1)
-            add_to_next_chunk = []
+        decoder = json.JSONDecoder()
+        with open(path, encoding="utf-8") as f:
+            buf = f.read(chunk_size)
+            pos = _JSON_START.match(buf).end()
             while True:
-                chunk = f.read(chunk_size)
-                if add_to_next_chunk:
-                    chunk = "".join(add_to_next_chunk[::-1]).lstrip(",") + chunk
-                    add_to_next_chunk = []
+                # Skip separators, reading more data if the buffer runs out
+                pos = _JSON_SEP.match(buf, pos).end()
+                if pos == len(buf):
+                    buf = f.read(chunk_size)
+                    pos = 0
+                    if not buf:
+                        break
+                    continue
 
-                if len(chunk) <= 1:
+                if buf[pos] == "]":
                     break
 
-                while True:
-                    try:
-                        for rec in json.loads(f"[{chunk.lstrip(',')[:-1]}]"):
-                            try:
-                                yield rec
-                            finally:
-                                self._notify_count += 1
-                                if not self._notify_count % 5000:
-                                    logger.info(
-                                        "Read %s records from %s",
-                                        self._notify_count,
-                                        self.json_path,
-                                    )
-                        break
-                    except json.JSONDecodeError:
-                        chunk, trailer = chunk.rsplit("{", 1)
-                        add_to_next_chunk.append(f"{{{trailer}")
+                # Decode the next record. Decoding fails only if the record is
+                # incomplete, in which case the rest of the record is read and
+                # decoding is retried from the start of the record.
+                try:
+                    rec, pos = decoder.raw_decode(buf, pos)
+                except json.JSONDecodeError:
+                    data = f.read(max(chunk_size, len(buf) - pos))
+                    if not data:
+                        raise
+                    buf = buf[pos:] + data
+                    pos = 0
+                    continue
+
+                # Caches contain complete records, so apply where and fields here
+                if self._conditions is not None:
+                    if not _match_record(rec, self._conditions):
+                        continue
+                if self._field_tree is not None:
+                    rec = _project(rec, self._field_tree)
+                if self._rec_class != dict:
+                    rec = self._rec_class(rec, module=self.module)
+
+                try:
+                    yield rec
+                finally:
+                    self._notify_count += 1
+                    if not self._notify_count % 5000:
+                        logger.info(
+                            "Read %s records from %s",
+                            self._notify_count,
+                            path,
+                        )
         logger.info("Read %s records total", self._notify_count)
         self._job_done = True
         if self._job_start:
@@ -210,7 +418,7 @@ class EMuReader:
             with open(path, "a", encoding="utf-8") as f:
                 f.write("[")
                 records = []
-                for rec in self.from_xml():
+                for rec in self._from_xml_complete():
                     records.append(rec)
                     if len(records) > 1000:
                         f.write(json.dumps(records, **params)[1:-1] + sep)
@@ -223,6 +431,171 @@ class EMuReader:
             os.remove(path)
             raise IOError("Conversion to JSON failed") from exc
 
+    def from_cache(self, start=0, chunk_size=2097152, path=None):
+        """Reads data from a binary cache file
+
+        Parameters
+        ----------
+        start : int
+            position of the first record to read
+        chunk_size : int
+            size of chunk to use when reading the file
+        path : str
+            path to the cache file. Defaults to cache_path.
+
+        Yields
+        ------
+        dict
+            EMu record
+        """
+        if path is None:
+            path = self.cache_path
+        logger.info("Reading records from %s", path)
+        self._job_start = None
+        self._job_done = False
+        self._notify_start = None
+        self._notify_count = 0
+        with open(path, "rb") as f:
+            offsets = _read_cache_offsets(f)
+            if start < len(offsets):
+                f.seek(offsets[start])
+                buf = b""
+                pos = 0
+                for _ in range(len(offsets) - start):
+                    # Read the file in large blocks to minimize read calls
+                    end = pos + _FRAME_HEADER.size
+                    if end > len(buf):
+                        buf = buf[pos:] + f.read(chunk_size)
+                        pos = 0
+                        end = _FRAME_HEADER.size
+                    (size,) = _FRAME_HEADER.unpack_from(buf, pos)
+                    pos = end
+                    end = pos + size
+                    if end > len(buf):
+                        buf = buf[pos:] + f.read(max(size, chunk_size))
+                        pos = 0
+                        end = size
+                    rec = pickle.loads(buf[pos:end])
+                    pos = end
+                    if self._conditions is not None:
+                        if not _match_record(rec, self._conditions):
+                            continue
+                    if self._field_tree is not None:
+                        rec = _project(rec, self._field_tree)
+                    if self._rec_class != dict:
+                        rec = self._rec_class(rec, module=self.module)
+                    try:
+                        yield rec
+                    finally:
+                        self._notify_count += 1
+                        if not self._notify_count % 5000:
+                            logger.info(
+                                "Read %s records from %s", self._notify_count, path
+                            )
+        logger.info("Read %s records total", self._notify_count)
+        self._job_done = True
+        if self._job_start:
+            self.report_progress()
+
+    def to_cache(self, path=None):
+        """Writes records from XML to a binary cache file
+
+        Each record is stored as a length-prefixed pickle. The file ends with
+        a table of the offset of each record, allowing reads to start at any
+        record.
+
+        Parameters
+        ----------
+        path : str
+            path to write the cache file. Defaults to cache_path.
+        """
+        if path is None:
+            path = self.cache_path
+
+        logger.info("Writing records from %s to cache", self.path)
+
+        offsets = array("Q")
+        try:
+            with open(path, "wb") as f:
+                f.write(_CACHE_MAGIC)
+                for rec in self._from_xml_complete():
+                    offsets.append(f.tell())
+                    data = pickle.dumps(rec, protocol=pickle.HIGHEST_PROTOCOL)
+                    f.write(_FRAME_HEADER.pack(len(data)))
+                    f.write(data)
+                table_offset = f.tell()
+                f.write(offsets.tobytes())
+                f.write(_CACHE_FOOTER.pack(len(offsets), table_offset, _CACHE_MAGIC))
+        except KeyboardInterrupt as exc:
+            # Remove the partial cache file if write is interrupted
+            os.remove(path)
+            raise IOError("Conversion to cache failed") from exc
+
+    def to_arrow(self, batch_size=10000):
+        """Reads records into a pyarrow Table
+
+        Requires pyarrow. Columns are typed using the DataType of each field
+        in the schema if one has been loaded: Integer fields become int64
+        columns, Float fields become float64 columns, and other fields become
+        string columns. Tables become list columns and references become
+        struct columns.
+
+        Parameters
+        ----------
+        batch_size : int
+            number of records to convert to each record batch
+
+        Returns
+        -------
+        pyarrow.Table
+            records from the source file
+        """
+        pa = _import_pyarrow()
+        batches = list(self._iter_batches(batch_size))
+        if not batches:
+            return pa.table({})
+        return pa.Table.from_batches(batches)
+
+    def to_parquet(self, path, batch_size=10000, **kwargs):
+        """Writes records to a Parquet file
+
+        Requires pyarrow. Records are converted and written one batch at a
+        time, so only one batch is held in memory. See to_arrow() for how
+        fields are mapped to columns.
+
+        Parameters
+        ----------
+        path : str
+            path to write the Parquet file
+        batch_size : int
+            number of records to write in each batch
+        kwargs :
+            keyword arguments passed to pyarrow.parquet.ParquetWriter
+        """
+        pa = _import_pyarrow()
+        import pyarrow.parquet as pq
+
+        logger.info("Writing records from %s to Parquet", self.path)
+
+        writer = None
+        try:
+            for batch in self._iter_batches(batch_size):
+                if writer is None:
+                    writer = pq.ParquetWriter(path, batch.schema, **kwargs)
+                writer.write_batch(batch)
+        except BaseException:
+            # Remove the partial Parquet file, which would otherwise look
+            # valid, if conversion fails or is interrupted
+            if writer is not None:
+                writer.close()
+                os.remove(path)
+            raise
+
+        if writer is None:
+            pq.write_table(pa.table({}), path, **kwargs)
+        else:
+            writer.close()
+
     def report_progress(self, by="time", at=5):
         """Prints progress notification messages when reading a file
 
@@ -254,6 +627,161 @@ class EMuReader:
             )
             self._notify_start = time.time()
 
+    def _iterparse(self, source, chunk_size=65536):
+        """Parses records from an XML source
+
+        The source is fed to a pull parser in blocks. The parser reports the
+        start of every table element, including the root and each table
+        nested in a record, but not tuples or atoms. Only the first event is
+        used to find the root. Events for nested tables are still returned to
+        Python and discarded, so their cost grows with the number of tables
+        in the file, but elements that are not tables are never seen in
+        Python until a record is parsed. Every child of the root except the
+        last is complete after each block is fed, and each record is removed
+        from the root once it has been read so that memory use does not grow
+        with the number of records.
+
+        Parameters
+        ----------
+        source : file-like
+            binary stream containing EMu XML
+        chunk_size : int
+            number of bytes to feed to the parser at a time
+
+        Yields
+        ------
+        dict
+            EMu record
+        """
+        parser = etree.XMLPullParser(events=("start",), tag="table")
+        root = None
+        while True:
+            data = source.read(chunk_size)
+            if data:
+                parser.feed(data)
+            else:
+                parser.close()
+
+            # The first event is the root table. Nested tables also report
+            # events, which are discarded.
+            for _, element in parser.read_events():
+                if root is None:
+                    root = element
+
+            if root is not None:
+                children = root[:-1] if data else root[:]
+                try:
+                    for element in children:
+                        # Skip comments and records that do not meet conditions
+                        if element.tag == "tuple" and (
+                            self._conditions is None
+                            or _match_element(element, self._conditions)
+                        ):
+                            yield self._parse(element)
+                finally:
+                    del root[: len(children)]
+
+            if not data:
+                break
+
+    def _from_xml_complete(self):
+        """Reads all complete records from XML regardless of fields and where
+
+        Records are always raw dicts. Used to write caches, which can then be
+        read using any fields, conditions, and record class.
+
+        Yields
+        ------
+        dict
+            EMu record
+        """
+        field_tree = self._field_tree
+        conditions = self._conditions
+        rec_class = self._rec_class
+        self._field_tree = None
+        self._conditions = None
+        self._rec_class = dict
+        try:
+            yield from self.from_xml()
+        finally:
+            self._field_tree = field_tree
+            self._conditions = conditions
+            self._rec_class = rec_class
+
+    def _from_xml_parallel(self, index=None):
+        """Reads data from XML using a pool of worker processes
+
+        Each file is split into blocks of complete records, which are parsed
+        in separate processes and yielded as each block is completed.
+
+        Parameters
+        ----------
+        index : dict
+            an empty index to which the location of each record is added as
+            files are split. The index is saved once every file has been split.
+
+        Yields
+        ------
+        dict
+            EMu record
+        """
+        self._job_start = None
+        self._job_done = False
+        self._notify_start = None
+        self._notify_count = 0
+
+        def _chunks():
+            for filelike in self.files:
+                logger.info("Reading records from %s", filelike)
+                records = None if index is None else []
+                with filelike.open("rb") as source:
+                    for chunk in _split_records(source, self.chunk_size, records):
+                        yield chunk
+                if index is not None:
+                    self._add_to_index(index, filelike, records)
+            if index is not None:
+                self._save_index(index)
+
+        with ProcessPoolExecutor(
+            max_workers=self.workers, initializer=_init_worker, initargs=(self,)
+        ) as executor:
+            chunks = _chunks()
+            pending = deque()
+            max_pending = 2 * self.workers
+            while True:
+                while len(pending) < max_pending:
+                    try:
+                        chunk = next(chunks)
+                    except StopIteration:
+                        break
+                    pending.append(executor.submit(_parse_chunk, chunk))
+
+                if not pending:
+                    break
+
+                if self.ordered:
+                    done = [pending.popleft()]
+                else:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        pending.remove(future)
+
+                for future in done:
+                    for rec in future.result():
+                        # Workers return raw records, which are converted here
+                        if self._rec_class != dict:
+                            rec = self._rec_class(rec, module=self.module)
+                        try:
+                            yield rec
+                        finally:
+                            self._notify_count += 1
+                            if not self._notify_count % 5000:
+                                logger.info("Read %s records", self._notify_count)
+
+        logger.info("Read %s records total", self._notify_count)
+        if self._job_start:
+            self.report_progress()
+
     def _parse(self, xml):
         """Parses a record from XML
 
@@ -267,15 +795,20 @@ class EMuReader:
         dict
            EMu record
         """
-        if self._rec_class != dict:
-            dct = self._rec_class(module=self.module)
-        else:
-            dct = self._rec_class()
+        dct = {}
+
+        # Field names are looked up in the symbol table so that each distinct
+        # name is stored once, not once per record. The kind of each field
+        # name is looked up at the same time. Short values are shared using a
+        # separate table that is emptied when full.
+        values = self._values
+        field_kinds = self._field_kinds
+        max_len = self.intern_values
 
-        elements = [(dct, "", xml)]
+        elements = [(dct, _OTHER, xml, self._field_tree)]
         while elements:
             new_elems = []
-            for obj, parent_name, elem in elements:
+            for obj, parent_kind, elem, tree in elements:
                 for child in elem:
 
                     # Add an empty rows to a nested table, which do not contain
@@ -284,10 +817,21 @@ class EMuReader:
                         obj.append(None)
                         continue
 
-                    # Get field name
+                    # Get field name and kind
                     name = child.get("name")
                     if name is None:
-                        name = ""
+                        name, kind = "", _OTHER
+                    else:
+                        name, kind = field_kinds[name]
+
+                    # Skip fields not included in the fields parameter. Table
+                    # rows and inner nested tables use the tree of their parent.
+                    child_tree = tree
+                    if tree is not None and name:
+                        if name in tree:
+                            child_tree = tree[name]
+                        elif kind != _NESTTAB_INNER:
+                            continue
 
                     # Get field text
                     text = child.text
@@ -296,50 +840,190 @@ class EMuReader:
 
                     # Add an atomic field
                     if child.tag == "atom":
+                        if (
+                            max_len
+                            and text is not None
+                            and len(text) <= max_len
+                            and name != "irn"
+                        ):
+                            try:
+                                text = values[text]
+                            except KeyError:
+                                if len(values) >= _MAX_INTERNED:
+                                    values.clear()
+                                values[text] = text
                         try:
                             obj[name] = text
                         except TypeError:
                             obj.append(text)
 
                     # Add a reference
-                    elif child.tag == "tuple" and is_ref(name) and not is_tab(name):
+                    elif child.tag == "tuple" and kind == _REF:
                         obj[name] = {}
-                        new_elems.append((obj[name], name, child))
+                        new_elems.append((obj[name], kind, child, child_tree))
 
                     # Add a table or reference table
                     elif child.tag == "table" or (child.tag == "tuple" and name):
                         try:
                             obj[name] = []
-                            new_elems.append((obj[name], name, child))
+                            new_elems.append((obj[name], kind, child, child_tree))
                         except TypeError:
                             obj.append([])
-                            new_elems.append((obj[-1], name, child))
+                            new_elems.append((obj[-1], kind, child, child_tree))
 
                     # Add a row to a table
-                    elif (
-                        child.tag == "tuple"
-                        and is_ref_tab(parent_name)
-                        and not is_nesttab(parent_name)
-                        and not is_nesttab_inner(parent_name)
-                    ):
+                    elif child.tag == "tuple" and parent_kind == _REF_TAB:
                         obj.append({})
-                        new_elems.append((obj[-1], name, child))
+                        new_elems.append((obj[-1], kind, child, child_tree))
 
                     # Add an empty row to an outer nested table
                     elif (
                         child.tag == "tuple"
-                        and is_nesttab(parent_name)
+                        and parent_kind == _NESTTAB
                         and not len(child)
                     ):
-                        new_elems.append((obj, name, [None]))
+                        new_elems.append((obj, kind, [None], child_tree))
 
                     elif child.tag == "tuple":
-                        new_elems.append((obj, name, child))
+                        new_elems.append((obj, kind, child, child_tree))
 
                 elements = new_elems
 
+        # Records are built as raw dicts and converted once complete, so
+        # rec_class can be any class that accepts a raw record and module
+        if self._rec_class != dict:
+            return self._rec_class(dct, module=self.module)
         return dct
 
+    def _iter_batches(self, batch_size):
+        """Converts records to pyarrow record batches
+
+        Columns are based on the first batch. Records in later batches that
+        include fields not seen in the first batch raise an error.
+
+        Parameters
+        ----------
+        batch_size : int
+            number of records in each batch
+
+        Yields
+        ------
+        pyarrow.RecordBatch
+            batch of records
+        """
+        pa = _import_pyarrow()
+
+        records = iter(self)
+        batch = list(islice(records, batch_size))
+        if not batch:
+            return
+
+        # Use the requested fields as columns if given, otherwise use every
+        # field found in the first batch
+        if self._field_tree is not None:
+            names = list(self._field_tree)
+        else:
+            names = list(dict.fromkeys(k for rec in batch for k in rec))
+
+        to_str = None if self._rec_class is dict else _to_str
+        columns = []
+        for name in names:
+            tree = self._field_tree[name] if self._field_tree is not None else None
+            samples = [rec.get(name) for rec in batch]
+            typ, convert = _arrow_field(
+                pa, self.schema, self.module, name, samples, tree, to_str
+            )
+            columns.append((name, typ, convert))
+
+        schema = pa.schema([(n, t) for n, t, _ in columns])
+        known = frozenset(names)
+
+        while batch:
+            for rec in batch:
+                if not known.issuperset(rec):
+                    raise ValueError(
+                        f"Record contains fields not found in the first batch:"
+                        f" {sorted(set(rec) - known)}. Use the fields parameter"
+                        f" to specify the fields to include."
+                    )
+            arrays = []
+            for name, typ, convert in columns:
+                vals = [rec.get(name) for rec in batch]
+                if convert is not None:
+                    vals = [convert(v) for v in vals]
+                arrays.append(pa.array(vals, type=typ))
+            yield pa.RecordBatch.from_arrays(arrays, schema=schema)
+            batch = list(islice(records, batch_size))
+
+    def _new_index(self):
+        """Creates an empty index"""
+        return {"files": [f.filename for f in self.files], "records": [], "irns": {}}
+
+    def _add_to_index(self, index, filelike, records):
+        """Adds the location of records in a source file to the index"""
+        file_index = self.files.index(filelike)
+        for offset, length, irn in records:
+            if irn is not None:
+                index["irns"][irn] = len(index["records"])
+            index["records"].append((file_index, offset, length, irn))
+
+    def _save_index(self, index, path=None):
+        """Assigns the index to the reader and writes it to a file"""
+        if path is None:
+            path = self.index_path
+        self._index = index
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(
+                    {"files": index["files"], "records": index["records"]},
+                    f,
+                    separators=(",", ":"),
+                )
+
+    def _load_index(self, build=True):
+        """Loads the index from a file, building it if required
+
+        The index file is only used if it is newer than the source files and
+        was built from the same list of files.
+
+        Parameters
+        ----------
+        build : bool
+            whether to build the index if the file cannot be used
+
+        Returns
+        -------
+        dict
+            the index or None if the index file cannot be used and build is
+            False
+        """
+        if self._index is None:
+            index = self._read_index()
+            if index is not None:
+                index["irns"] = {
+                    rec[-1]: i
+                    for i, rec in enumerate(index["records"])
+                    if rec[-1] is not None
+                }
+                self._index = index
+            elif build:
+                self.build_index()
+        return self._index
+
+    def _read_index(self):
+        """Reads the index file if it is current, otherwise returns None"""
+        try:
+            if os.path.getmtime(self.index_path) < self.files[-1].getmtime():
+                return None
+            with open(self.index_path, encoding="utf-8") as f:
+                index = json.load(f)
+        except (FileNotFoundError, TypeError, ValueError):
+            return None
+        if index.get("files") != [f.filename for f in self.files]:
+            logger.info("Rebuilding index (source files have changed)")
+            return None
+        return index
+
     def _get_files(self):
         """Analyzes source files on self.path"""
         files = []
@@ -379,6 +1063,615 @@ class EMuReader:
         return self.schema
 
 
+#: bytes : identifies a binary cache file written by EMuReader.to_cache()
+_CACHE_MAGIC = b"XMUCACHE"
+
+#: struct.Struct : length of each record in a binary cache file
+_FRAME_HEADER = struct.Struct("<I")
+
+#: struct.Struct : record count and offset table position in a binary cache file
+_CACHE_FOOTER = struct.Struct("<QQ8s")
+
+#: re.Pattern : matches whitespace and the opening bracket in a JSON cache file
+_JSON_START = re.compile(r"\s*\[?")
+
+#: re.Pattern : matches whitespace and commas between records in a JSON cache file
+_JSON_SEP = re.compile(r"[\s,]*")
+
+#: int : maximum number of values kept in the table of shared values used by
+#: EMuReader before it is emptied
+_MAX_INTERNED = 16384
+
+#: EMuReader : reader used to parse records in a worker process
+_worker_reader = None
+
+#: re.Pattern : matches opening, closing, and self-closing tuple and table tags.
+#: Also matches comments, CDATA sections, and processing instructions so that
+#: tags inside them are skipped, and the start of any of those that are not
+#: closed in the data being searched.
+_TAG_PATTERN = re.compile(
+    rb"<!--.*?-->|<!\[CDATA\[.*?\]\]>|<\?.*?\?>"
+    rb"|<(/?)(table|tuple)(?=[\s/>])[^>]*?(/?)>"
+    rb"|(<!--|<!\[CDATA\[|<\?)",
+    re.S,
+)
+
+#: re.Pattern : matches tuple and table tags and irn atoms
+_IRN_PATTERN = re.compile(
+    _TAG_PATTERN.pattern + rb'|<atom name="irn">([^<]*)</atom>', re.S
+)
+
+
+def _read_cache_offsets(f):
+    """Reads the offset of each record from a binary cache file
+
+    Parameters
+    ----------
+    f : file-like
+        binary cache file opened for reading
+
+    Returns
+    -------
+    array.array
+        offset of each record in the file
+    """
+    try:
+        f.seek(-_CACHE_FOOTER.size, os.SEEK_END)
+        count, table_offset, magic = _CACHE_FOOTER.unpack(f.read(_CACHE_FOOTER.size))
+    except (OSError, struct.error) as exc:
+        raise IOError(f"Invalid cache file: {f.name}") from exc
+    if magic != _CACHE_MAGIC:
+        raise IOError(f"Invalid cache file: {f.name}")
+    f.seek(table_offset)
+    offsets = array("Q")
+    offsets.frombytes(f.read(count * offsets.itemsize))
+    return offsets
+
+
+def _arrow_field(pa, schema, module, name, samples, tree=None, to_str=None):
+    """Determines the pyarrow type of a field and how to convert its values
+
+    Parameters
+    ----------
+    pa : module
+        the pyarrow module
+    schema : EMuSchema
+        the EMu schema. If None, all atoms are treated as strings.
+    module : str
+        backend module name
+    name : str
+        field name
+    samples : list
+        values of the field used to find subfields in references
+    tree : dict
+        tree of field names created by _compile_fields()
+    to_str : callable
+        function used to convert string values. If None, string values are
+        used as is.
+
+    Returns
+    -------
+    tuple
+        pyarrow type and a function to convert values to that type or None
+        if values can be used as is
+    """
+    info = {}
+    if schema is not None:
+        try:
+            info = schema.get_field_info(module, name, visible_only=False)
+        except KeyError:
+            pass
+
+    # Tables are lists of values and nested tables are lists of lists
+    levels = 0
+    if is_tab(name):
+        levels = 2 if is_nesttab(name) else 1
+    for _ in range(levels):
+        samples = [v for s in samples if s for v in s]
+
+    if is_ref(name):
+        ref_module = info.get("RefTable", module)
+        samples = [s for s in samples if isinstance(s, dict)]
+        if tree:
+            keys = list(tree)
+        else:
+            keys = list(dict.fromkeys(k for s in samples for k in s))
+        fields = []
+        converters = []
+        for key in keys:
+            typ, convert = _arrow_field(
+                pa,
+                schema,
+                ref_module,
+                key,
+                [s.get(key) for s in samples],
+                tree[key] if tree else None,
+                to_str,
+            )
+            fields.append((key, typ))
+            converters.append((key, convert))
+        typ = pa.struct(fields)
+        convert = partial(_convert_struct, tuple(converters), frozenset(keys))
+    else:
+        data_type = info.get("DataType")
+        if data_type == "Integer":
+            typ, convert = pa.int64(), _to_int
+        elif data_type == "Float":
+            typ, convert = pa.float64(), _to_float
+        else:
+            typ, convert = pa.string(), to_str
+
+    for _ in range(levels):
+        typ = pa.list_(typ)
+        if convert is not None:
+            convert = partial(_convert_list, convert)
+
+    return typ, convert
+
+
+def _convert_list(convert, val):
+    """Converts each item in a table for use in a pyarrow list column"""
+    if val is None:
+        return None
+    return [convert(v) for v in val]
+
+
+def _convert_struct(converters, keys, val):
+    """Converts a reference for use in a pyarrow struct column"""
+    if val is None:
+        return None
+    if not keys.issuperset(val):
+        raise ValueError(
+            f"Reference contains fields not found in the first batch:"
+            f" {sorted(set(val) - keys)}. Use the fields parameter to specify"
+            f" the fields to include."
+        )
+    return {
+        k: val.get(k) if convert is None else convert(val.get(k))
+        for k, convert in converters
+    }
+
+
+def _import_pyarrow():
+    """Imports pyarrow, which is required to export to Arrow or Parquet"""
+    try:
+        import pyarrow
+    except ImportError as exc:
+        raise ImportError(
+            "pyarrow is required to export records to Arrow or Parquet"
+            " (pip install xmu[arrow])"
+        ) from exc
+    return pyarrow
+
+
+def _to_float(val):
+    """Converts a value for use in a pyarrow float64 column"""
+    return None if val is None or val == "" else float(val)
+
+
+def _to_int(val):
+    """Converts a value for use in a pyarrow int64 column"""
+    return None if val is None or val == "" else int(val)
+
+
+def _to_str(val):
+    """Converts a value for use in a pyarrow string column"""
+    return None if val is None else str(val)
+
+
+def _compile_fields(fields):
+    """Compiles a list of paths into a tree of field names
+
+    Parameters
+    ----------
+    fields : list of str
+        paths to fields, for example, "EmuRef.irn"
+
+    Returns
+    -------
+    dict
+        tree of field names. Each name maps to a tree for its children or to
+        None if all of its children should be included.
+    """
+    tree = {}
+    for path in fields:
+        keys = re.split(r"[./]", path)
+        node = tree
+        for key in keys[:-1]:
+            node = node.setdefault(key, {})
+            # A parent included in full takes precedence over its children
+            if node is None:
+                break
+        else:
+            node[keys[-1]] = None
+    return tree
+
+
+def _compile_where(where):
+    """Compiles conditions into a list of paths and tests
+
+    Parameters
+    ----------
+    where : dict
+        conditions keyed to the path of an atomic field or reference field
+
+    Returns
+    -------
+    list
+        list of (keys, test), where test is a function that accepts the text
+        of a field and returns True if the field meets the condition
+    """
+    conditions = []
+    for path, cond in where.items():
+        keys = tuple(re.split(r"[./]", path))
+        if any(is_tab(k) for k in keys):
+            raise ValueError(f"Conditions cannot be applied to tables: {path}")
+        if callable(cond):
+            test = cond
+        elif cond is None:
+            test = partial(operator.is_, None)
+        elif isinstance(cond, range):
+            test = partial(_in_range, cond)
+        elif isinstance(cond, (list, tuple, set, frozenset)):
+            test = frozenset(str(c) for c in cond).__contains__
+        else:
+            test = partial(operator.eq, str(cond))
+        conditions.append((keys, test))
+    return conditions
+
+
+def _escape(val):
+    """Escapes a string for use as an XML attribute value"""
+    return (
+        str(val)
+        .replace("&", "&amp;")
+        .replace("<", "&lt;")
+        .replace('"', "&quot;")
+        .encode("utf-8")
+    )
+
+
+def _init_worker(reader):
+    """Stores the reader used to parse records in a worker process
+
+    Workers always create raw records, which can be pickled and sent back to
+    the main process, where rec_class is applied.
+    """
+    global _worker_reader
+    reader._rec_class = dict
+    _worker_reader = reader
+
+
+def _in_range(rng, val):
+    """Tests if a string represents an integer in a range"""
+    try:
+        return int(val) in rng
+    except (TypeError, ValueError):
+        return False
+
+
+def _match_element(element, conditions):
+    """Tests if a record meets a list of conditions using its XML
+
+    Parameters
+    ----------
+    element : lxml.Element
+        XML representing a single record
+    conditions : list
+        list of conditions created by _compile_where()
+
+    Returns
+    -------
+    bool
+        True if the record meets all conditions, False if not
+    """
+    for keys, test in conditions:
+        node = element
+        for key in keys:
+            for child in node:
+                if child.get("name") == key:
+                    node = child
+                    break
+            else:
+                node = None
+                break
+        text = None
+        if node is not None and node.text is not None:
+            text = node.text.strip() or None
+        if not test(text):
+            return False
+    return True
+
+
+def _match_record(rec, conditions):
+    """Tests if a record meets a list of conditions using its values
+
+    Parameters
+    ----------
+    rec : dict
+        EMu record
+    conditions : list
+        list of conditions created by _compile_where()
+
+    Returns
+    -------
+    bool
+        True if the record meets all conditions, False if not
+    """
+    for keys, test in conditions:
+        val = rec
+        for key in keys:
+            val = val.get(key) if isinstance(val, dict) else None
+        if val is not None and not isinstance(val, str):
+            val = str(val)
+        if not test(val or None):
+            return False
+    return True
+
+
+def _parse_chunk(chunk):
+    """Parses a block of records in a worker process
+
+    Parameters
+    ----------
+    chunk : bytes
+        one or more complete record tuples from an EMu XML file
+
+    Returns
+    -------
+    list
+        list of EMu records
+    """
+    reader = _worker_reader
+    module = (reader.module or "").encode("utf-8")
+    source = BytesIO(b'<table name="' + module + b'">' + chunk + b"</table>")
+    return list(reader._iterparse(source))
+
+
+def _project(obj, tree):
+    """Copies the parts of a record that appear in a tree of field names
+
+    Parameters
+    ----------
+    obj : mixed
+        a record or part of a record
+    tree : dict
+        tree of field names created by _compile_fields()
+
+    Returns
+    -------
+    mixed
+        the part of the record included in the tree
+    """
+    if tree is None:
+        return obj
+    if isinstance(obj, dict):
+        return {k: _project(obj[k], tree[k]) for k in tree if k in obj}
+    if isinstance(obj, list):
+        return [_project(o, tree) for o in obj]
+    return obj
+
+
+def _split_records(stream, chunk_size=4194304, records=None):
+    """Splits an EMu XML file into blocks of complete records
+
+    Parameters
+    ----------
+    stream : file-like
+        binary stream containing EMu XML
+    chunk_size : int
+        minimum size of each block in bytes. The final block may be smaller.
+    records : list
+        if given, (offset, length, irn) is appended for each record found
+
+    Yields
+    ------
+    bytes
+        one or more complete record tuples
+    """
+    scanner = _RecordScanner()
+    chunk = []
+    size = 0
+    while True:
+        data = stream.read(65536)
+        for offset, rec in scanner.feed(data):
+            if records is not None:
+                records.append((offset, len(rec), _get_irn(rec)))
+            chunk.append(rec)
+            size += len(rec)
+            if size >= chunk_size:
+                yield b"".join(chunk)
+                chunk = []
+                size = 0
+        if not data:
+            scanner.close()
+            break
+    if chunk:
+        yield b"".join(chunk)
+
+
+def _get_irn(rec):
+    """Gets the irn of a record from its XML
+
+    Parameters
+    ----------
+    rec : bytes
+        a single record tuple
+
+    Returns
+    -------
+    str
+        the irn of the record or None if no irn found
+    """
+    depth = 0
+    for match in _IRN_PATTERN.finditer(rec):
+        closing, tag, self_closing, _, irn = match.groups()
+        if irn is not None:
+            if depth == 1:
+                return irn.decode("utf-8").strip()
+        elif tag is None:
+            continue
+        elif closing:
+            depth -= 1
+        elif not self_closing:
+            depth += 1
+    return None
+
+
+class _RecordScanner:
+    """Finds complete top-level records in a stream of EMu XML
+
+    Tags inside comments, CDATA sections, and processing instructions are
+    ignored.
+
+    Attributes
+    ----------
+    offset : int
+        position in the stream of the first byte in the buffer
+    """
+
+    def __init__(self):
+        self.offset = 0
+        self._buf = b""
+        self._pos = 0
+        self._depth = 0
+        self._start = None
+        self._unclosed = False
+
+    def feed(self, data):
+        """Adds data to the scanner
+
+        Parameters
+        ----------
+        data : bytes
+            the next block of data from the stream
+
+        Returns
+        -------
+        list
+            list of (offset, bytes) for each record completed by data
+        """
+        buf = self._buf + data
+        pos = self._pos
+        records = []
+        self._unclosed = False
+        for match in _TAG_PATTERN.finditer(buf, pos):
+            closing, tag, self_closing, unclosed = match.groups()
+            # Wait for more data if a comment, CDATA section, or processing
+            # instruction is not closed yet
+            if unclosed:
+                self._unclosed = True
+                break
+            if tag is None:
+                pos = match.end()
+                continue
+            if closing:
+                self._depth -= 1
+                if self._depth == 1 and tag == b"tuple":
+                    rec = buf[self._start : match.end()]
+                    records.append((self.offset + self._start, rec))
+                    self._start = None
+            elif self_closing:
+                if self._depth == 1 and tag == b"tuple":
+                    records.append((self.offset + match.start(), match.group()))
+            else:
+                if self._depth == 1 and tag == b"tuple":
+                    self._start = match.start()
+                self._depth += 1
+            pos = match.end()
+
+        # Discard data that is not part of an incomplete record or tag
+        keep = pos if self._start is None else self._start
+        self._buf = buf[keep:]
+        self._pos = pos - keep
+        self.offset += keep
+        if self._start is not None:
+            self._start -= keep
+        return records
+
+    def close(self):
+        """Checks that the stream did not end in the middle of a record
+
+        Raises
+        ------
+        ValueError
+            if a record, table, comment, CDATA section, or processing
+            instruction was not closed
+        """
+        if self._start is not None:
+            raise ValueError(
+                f"XML ended inside a record starting at byte"
+                f" {self.offset + self._start}"
+            )
+        if self._depth or self._unclosed:
+            raise ValueError("XML ended before all elements were closed")
+
+
+# Kinds of field names used to decide how to read each element
+_OTHER, _REF, _REF_TAB, _NESTTAB, _NESTTAB_INNER = range(5)
+
+
+class _FieldKinds(dict):
+    """Maps field names to their kind, classifying each name on first use
+
+    Each name maps to a tuple of the name from the symbol table and its kind,
+    so that a record can be parsed using one lookup per element instead of
+    checking the suffix of the name every time it appears.
+
+    Parameters
+    ----------
+    symbols : dict
+        the symbol table used to store each distinct field name once
+    """
+
+    def __init__(self, symbols):
+        super().__init__()
+        self._symbols = symbols
+
+    def __missing__(self, name):
+        if is_nesttab_inner(name):
+            kind = _NESTTAB_INNER
+        elif is_nesttab(name):
+            kind = _NESTTAB
+        elif is_ref_tab(name):
+            kind = _REF_TAB
+        elif is_ref(name) and not is_tab(name):
+            kind = _REF
+        else:
+            kind = _OTHER
+        self[name] = val = (self._symbols.setdefault(name, name), kind)
+        return val
+
+
+class _IndexingStream:
+    """Wraps a binary stream to record the location of each record as it is read
+
+    Parameters
+    ----------
+    stream : file-like
+        binary stream containing EMu XML
+
+    Attributes
+    ----------
+    records : list
+        list of (offset, length, irn) for each record read so far
+    """
+
+    def __init__(self, stream):
+        self.records = []
+        self._stream = stream
+        self._scanner = _RecordScanner()
+
+    def read(self, size=-1):
+        """Reads data from the stream"""
+        data = self._stream.read(size)
+        for offset, rec in self._scanner.feed(data):
+            self.records.append((offset, len(rec), _get_irn(rec)))
+        if not data and size:
+            self._scanner.close()
+        return data
+
+
 class FileLike:
     """Open text and zip files using the same interface
 
@@ -460,28 +1753,34 @@ class _ByteDecoder:
 def write_import(records, path, **kwargs):
     """Writes records to an EMu import file
 
+    Records are serialized one at a time, so records can be supplied by a
+    generator without holding the whole import in memory.
+
     Parameters
     ----------
-    records : list-like
-        list of EMuRecords to be imported
+    records : iterable
+        list or other iterable of EMuRecords to be imported
     path : str
         path to write the import file
     kwargs :
         any keyword argument accepted by the to_xml() method of the record class
     """
-    root = etree.Element("table")
-    root.set("name", records[0].module)
-    root.addprevious(etree.Comment(" Data "))
-
-    for rec in records:
-        rec.copy().to_xml(root, **kwargs)
-
-    for i, rec in enumerate(root):
-        rec.addprevious(etree.Comment(f" Row {i + 1} "))
-
-    root.getroottree().write(
-        path, pretty_print=True, xml_declaration=True, encoding="utf-8"
-    )
+    records = iter(records)
+    try:
+        first = next(records)
+    except StopIteration as exc:
+        raise ValueError("Must provide at least one record") from exc
+
+    with open(path, "wb") as f:
+        f.write(b"<?xml version='1.0' encoding='UTF-8'?>\n<!-- Data -->\n")
+        f.write(b'<table name="' + _escape(first.module) + b'">\n')
+        for i, rec in enumerate(chain([first], records)):
+            tup = rec.to_xml(**kwargs)
+            etree.indent(tup, space="  ", level=1)
+            f.write(f"  <!-- Row {i + 1} -->\n  ".encode("utf-8"))
+            f.write(etree.tostring(tup, encoding="utf-8"))
+            f.write(b"\n")
+        f.write(b"</table>\n")
 
 
 def write_group(records, path, irn=None, name=None):
@@ -1,15 +1,36 @@
 """Wrappers for data that can be garbled during read/write"""
 import logging
 import re
-from calendar import monthrange
+from calendar import month_abbr, monthrange
 from datetime import date, datetime, time
+from functools import lru_cache
 from math import log10, modf
 
+from .utils import _cache
+
 
 logger = logging.getLogger(__name__)
 
+#: object : marks a format that was not provided to an EMuType constructor
+_MISSING = object()
+
+
+class _EMuTypeMeta(type):
+    """Reuses the parsed state of EMuType objects created from strings
+
+    Objects created from the same class, string, and format are parsed once
+    and stored in a bounded cache. Each call returns a copy of the cached
+    object, so changes made to one object, for example, by augmented
+    assignment, do not affect the cache or other objects.
+    """
+
+    def __call__(cls, val, fmt=_MISSING):
+        if cls.use_cache and isinstance(val, str):
+            return _create_cached(cls, val, fmt)._clone()
+        return _create(cls, val, fmt)
 
-class EMuType:
+
+class EMuType(metaclass=_EMuTypeMeta):
     """Container for data types that may be garbled during read/write
 
     For example, transforming a year to a date using datetime.strptime()
@@ -35,6 +56,12 @@ class EMuType:
         the original, unparsed value
     """
 
+    __slots__ = ("verbatim", "value", "format")
+
+    #: bool : whether to reuse the parsed state of objects created from the
+    #: same class, string, and format. Can be set on individual subclasses.
+    use_cache = True
+
     def __init__(self, val, fmt="{}"):
         self.verbatim = val
         self.value = val
@@ -200,6 +227,48 @@ class EMuType:
             other = self.__class__(other)
         return other
 
+    @classmethod
+    def from_strings(cls, vals, as_array=False):
+        """Creates objects from a list of strings
+
+        Each distinct string is parsed once, and the result is copied for
+        each string that repeats it. Empty values are returned as None.
+
+        Parameters
+        ----------
+        vals : iterable of str
+            values to parse
+        as_array : bool
+            whether to return the parsed values as numpy arrays instead of
+            a list of objects. Requires numpy.
+
+        Returns
+        -------
+        list or numpy.ndarray
+            parsed values
+
+        Raises
+        ------
+        TypeError
+            if as_array is True and the class has no array form
+        """
+        parsed = {}
+        objs = []
+        for val in vals:
+            if val is None or val == "":
+                objs.append(None)
+                continue
+            try:
+                obj = parsed[val]
+            except KeyError:
+                obj = parsed[val] = cls(val)
+                objs.append(obj)
+            else:
+                objs.append(obj._clone())
+        if as_array:
+            return cls._to_array(objs)
+        return objs
+
     def copy(self):
         """Creates a copy of the current object"""
         return self.__class__(self.verbatim)
@@ -208,6 +277,27 @@ class EMuType:
         """Checks if class represents a range"""
         return self.min_value != self.max_value
 
+    def _clone(self):
+        """Copies the current object without parsing the original value again"""
+        cls = self.__class__
+        obj = cls.__new__(cls)
+        for attr in _slot_names(cls):
+            try:
+                setattr(obj, attr, getattr(self, attr))
+            except AttributeError:
+                pass
+        # Subclasses that do not define __slots__ also have a __dict__
+        try:
+            obj.__dict__.update(self.__dict__)
+        except AttributeError:
+            pass
+        return obj
+
+    @classmethod
+    def _to_array(cls, objs):
+        """Converts a list of parsed values to numpy arrays"""
+        raise TypeError(f"{cls.__name__} values cannot be converted to an array")
+
     def _math_op(self, other, operation):
         """Performs the specified arithmetic operation"""
 
@@ -268,6 +358,8 @@ class EMuFloat(EMuType):
         the original, unparsed value
     """
 
+    __slots__ = ()
+
     def __init__(self, val, fmt=None):
         """Initialize an EMuFloat object
 
@@ -322,6 +414,14 @@ class EMuFloat(EMuType):
         """Number of decimal places from the formatting string"""
         return int(self.format.strip("{:.f}"))
 
+    @classmethod
+    def _to_array(cls, objs):
+        """Converts a list of parsed values to a float array with NaN for None"""
+        np = _import_numpy()
+        return np.array(
+            [float("nan") if o is None else o.value for o in objs], dtype="float64"
+        )
+
 
 class EMuCoord(EMuFloat):
     """Wraps coordinates read from strings
@@ -371,6 +471,10 @@ class EMuCoord(EMuFloat):
         5: deg_dist_m / 100000,
     }
 
+    # Degrees, minutes, and seconds are stored as (value, format) tuples
+    # instead of EMuFloat objects to reduce memory use
+    __slots__ = ("_parts", "_sign")
+
     def __init__(self, val, fmt=None):
         """Initializes an EMuCoord object
 
@@ -384,29 +488,25 @@ class EMuCoord(EMuFloat):
 
         self.verbatim = val
 
-        self.minutes = None
-        self.seconds = None
         if isinstance(val, str):
             self.verbatim = val.strip()
-            parts = re.findall(r"(\d+(?:\.\d+)?)", self.verbatim)
+            parts = _COORD_PARTS.findall(self.verbatim)
             if len(parts) > 3:
                 raise ValueError(f"Invalid coordinate: {self.verbatim}")
-            self.degrees = EMuFloat(parts[0])
-            if len(parts) > 1:
-                self.minutes = EMuFloat(parts[1])
-            if len(parts) > 2:
-                self.seconds = EMuFloat(parts[2])
+            parts = [_parse_coord_part(parts[0])] + [
+                _parse_coord_part(p) for p in parts[1:]
+            ]
+            self._parts = tuple(parts + [None] * (3 - len(parts)))
         elif isinstance(val, EMuCoord):
             self.verbatim = val.verbatim
-            for attr in ("degrees", "minutes", "seconds"):
-                if getattr(val, attr) is not None:
-                    setattr(self, attr, getattr(val, attr).copy())
+            self._parts = val._parts
         else:
-            self.degrees = EMuFloat(abs(val), fmt=fmt)
+            degrees = EMuFloat(abs(val), fmt=fmt)
+            self._parts = ((degrees.value, degrees.format), None, None)
 
-        self._sign = EMuFloat(self._get_sign(), fmt="{:.0f}")
+        self._sign = self._get_sign()
 
-        self.value = float(self)
+        self.value = self._get_value()
         if self.value < min(self.bounds) or self.value > max(self.bounds):
             raise ValueError(f"Coordinate out of bounds ({val} not in {self.bounds})")
 
@@ -417,19 +517,35 @@ class EMuCoord(EMuFloat):
             return format(float(self), format_spec)
 
     def __str__(self):
-        parts = (self.degrees, self.minutes, self.seconds)
-        return f"{' '.join([str(p) for p in parts if p is not None])} {self.hemisphere}"
+        parts = [fmt.format(val) for val, fmt in filter(None, self._parts)]
+        return f"{' '.join(parts)} {self.hemisphere}"
 
-    def __int__(self):
-        return int(float(self))
+    @property
+    def degrees(self):
+        """Degrees parsed from original"""
+        return self._get_part(0)
 
-    def __float__(self):
-        val = EMuFloat(self.degrees)
-        if self.minutes:
-            val += self.minutes / 60
-        if self.seconds:
-            val += self.seconds / 3600
-        return float(self._sign * val)
+    @degrees.setter
+    def degrees(self, val):
+        self._set_part(0, val)
+
+    @property
+    def minutes(self):
+        """Minutes parsed from original, if any"""
+        return self._get_part(1)
+
+    @minutes.setter
+    def minutes(self, val):
+        self._set_part(1, val)
+
+    @property
+    def seconds(self):
+        """Seconds parsed from original, if any"""
+        return self._get_part(2)
+
+    @seconds.setter
+    def seconds(self, val):
+        self._set_part(2, val)
 
     @property
     def hemisphere(self):
@@ -439,7 +555,7 @@ class EMuCoord(EMuFloat):
     @property
     def kind(self):
         """Gets kind of verbatim coordinate string"""
-        return "decimal" if self.minutes is None else "dms"
+        return "decimal" if self._parts[1] is None else "dms"
 
     def to_dms(self, unc_m=None):
         """Expresses coordinate as degrees-minutes-seconds
@@ -529,7 +645,8 @@ class EMuCoord(EMuFloat):
         orig_unc_m = self.coord_uncertainty_m()
         if unc_m is None:
             if self.kind == "decimal":
-                return str(self._sign * self.degrees)
+                val, fmt = self._parts[0]
+                return fmt.format(self._sign * val)
             unc_m = orig_unc_m
 
         unc_m = self._round_to_exp_10(unc_m)
@@ -554,12 +671,13 @@ class EMuCoord(EMuFloat):
         int
             uncertainty in meters, rounded to an exponent of 10
         """
-        if self.seconds:
-            unc_m = self.deg_dist_m / (3600 * 10 ** self.seconds.dec_places)
-        elif self.minutes:
-            unc_m = self.deg_dist_m / (60 * 10 ** self.minutes.dec_places)
+        degrees, minutes, seconds = self._parts
+        if seconds:
+            unc_m = self.deg_dist_m / (3600 * 10 ** _dec_places(seconds[1]))
+        elif minutes:
+            unc_m = self.deg_dist_m / (60 * 10 ** _dec_places(minutes[1]))
         else:
-            unc_m = self.deg_dist_m / 10 ** self.degrees.dec_places
+            unc_m = self.deg_dist_m / 10 ** _dec_places(degrees[1])
         return self._round_to_exp_10(unc_m)
 
     def _get_sign(self):
@@ -583,6 +701,35 @@ class EMuCoord(EMuFloat):
 
         return 1 if self.verbatim >= 0 else -1
 
+    def _get_value(self):
+        """Calculates the coordinate as a signed decimal"""
+        degrees, minutes, seconds = self._parts
+        val = degrees[0]
+        if minutes is not None:
+            val += minutes[0] / 60
+        if seconds is not None:
+            val += seconds[0] / 3600
+        return self._sign * val
+
+    def _get_part(self, i):
+        """Gets degrees, minutes, or seconds as an EMuFloat"""
+        part = self._parts[i]
+        if part is None:
+            return None
+        return EMuFloat(*part)
+
+    def _set_part(self, i, val):
+        """Sets degrees, minutes, or seconds from an EMuFloat or string"""
+        parts = list(self._parts)
+        if val is None:
+            parts[i] = None
+        else:
+            if not isinstance(val, EMuFloat):
+                val = EMuFloat(val)
+            parts[i] = (val.value, val.format)
+        self._parts = tuple(parts)
+        self.value = self._get_value()
+
     @staticmethod
     def _round_to_exp_10(val):
         """Rounds value to an exponent of 10"""
@@ -595,6 +742,8 @@ class EMuCoord(EMuFloat):
 class EMuLatitude(EMuCoord):
     """Wraps latitudes read from strings"""
 
+    __slots__ = ()
+
     #: str : pattern for hemisphere for positive coordinates
     pos = "N(orth)?"
 
@@ -620,6 +769,8 @@ class EMuLatitude(EMuCoord):
 class EMuLongitude(EMuCoord):
     """Wraps longitudes read from strings"""
 
+    __slots__ = ()
+
     #: str : pattern for hemisphere for positive coordinates
     pos = "E(ast)?"
 
@@ -671,8 +822,14 @@ class EMuDate(EMuType):
         "month": ("%B", "%b", "%m", "%-m"),
         "year": ("%Y", "%y"),
     }
+    __slots__ = ("kind",)
+
     formats = {"day": "%Y-%m-%d", "month": "%b %Y", "year": "%Y"}
 
+    #: bool : whether to reuse the parsed state of objects. Disabled because
+    #: strings are already cached by _parse_date(), which is faster.
+    use_cache = False
+
     def __init__(self, val, fmt=None):
         """Initialize an EMuDate object
 
@@ -686,14 +843,15 @@ class EMuDate(EMuType):
 
         self.verbatim = val
 
+        # Strings are parsed by a memoized function that checks the common
+        # formats with a regular expression before trying strptime()
+        if fmt is None and isinstance(val, str):
+            self.value, self.kind, self.format = _parse_date(val)
+            return
+
         fmt_provided = fmt is not None
 
-        fmts = [
-            ("day", "%Y-%m-%d"),
-            ("month", "%Y-%m-"),
-            ("month", "%b %Y"),
-            ("year", "%Y"),
-        ]
+        fmts = list(_DATE_FORMATS)
 
         if isinstance(val, EMuDate):
             self.value = val.value
@@ -848,8 +1006,31 @@ class EMuDate(EMuType):
         """Day of the parsed date"""
         return self.value.day if self.kind == "day" else None
 
+    @classmethod
+    def _to_array(cls, objs):
+        """Converts a list of parsed values to arrays of ordinals and kinds
+
+        Returns
+        -------
+        tuple of numpy.ndarray
+            the proleptic Gregorian ordinal of each date (0 for None) and the
+            kind of each date ("" for None)
+        """
+        np = _import_numpy()
+        ordinals = np.array(
+            [0 if o is None else o.value.toordinal() for o in objs], dtype="int64"
+        )
+        kinds = np.array(["" if o is None else o.kind for o in objs], dtype="U5")
+        return ordinals, kinds
+
 
 class EMuTime(EMuType):
+    __slots__ = ()
+
+    #: bool : whether to reuse the parsed state of objects. Disabled because
+    #: strings are already cached by _parse_time(), which is faster.
+    use_cache = False
+
     def __init__(self, val, fmt=None):
         """Initialize an EMuTime object
 
@@ -863,21 +1044,15 @@ class EMuTime(EMuType):
 
         self.verbatim = val
 
+        # Strings are parsed by a memoized function that checks the common
+        # formats with a regular expression before trying strptime()
+        if fmt is None and isinstance(val, str):
+            self.value, self.format = _parse_time(val)
+            return
+
         fmt_provided = fmt is not None
 
-        # Include both naive and timezoned formats
-        fmts = [
-            "%H:%M",
-            "%H%M",
-            "%I%M %p",
-            "%I:%M %p",
-            "%H:%M:%S",
-            "%I:%M:%S %p",
-        ]
-        num_formats = len(fmts)
-        fmts.extend([f"{f} %z" for f in fmts[:num_formats]])
-        fmts.extend([f"{f} UTC%z" for f in fmts[:num_formats]])
-        fmts.insert(0, "%H:%M:")
+        fmts = list(_TIME_FORMATS)
 
         if isinstance(val, EMuTime):
             self.value = val.value
@@ -985,3 +1160,297 @@ class EMuTime(EMuType):
     def tzinfo(self):
         """Time zone info for the parsed time"""
         return self.value.tzinfo
+
+    @classmethod
+    def _to_array(cls, objs):
+        """Converts a list of parsed values to a float array of seconds
+
+        Returns
+        -------
+        numpy.ndarray
+            seconds since midnight for each time (NaN for None). Time zones
+            are ignored.
+        """
+        np = _import_numpy()
+        return np.array(
+            [
+                (
+                    float("nan")
+                    if o is None
+                    else o.value.hour * 3600
+                    + o.value.minute * 60
+                    + o.value.second
+                    + o.value.microsecond / 1e6
+                )
+                for o in objs
+            ],
+            dtype="float64",
+        )
+
+
+#: list of tuple : kinds and formats tried by EMuDate, in order
+_DATE_FORMATS = [
+    ("day", "%Y-%m-%d"),
+    ("month", "%Y-%m-"),
+    ("month", "%b %Y"),
+    ("year", "%Y"),
+]
+
+#: list of str : formats tried by EMuTime, in order, including both naive and
+#: timezoned formats
+_TIME_FORMATS = [
+    "%H:%M",
+    "%H%M",
+    "%I%M %p",
+    "%I:%M %p",
+    "%H:%M:%S",
+    "%I:%M:%S %p",
+]
+_TIME_FORMATS = (
+    ["%H:%M:"]
+    + _TIME_FORMATS
+    + [f"{f} %z" for f in _TIME_FORMATS]
+    + [f"{f} UTC%z" for f in _TIME_FORMATS]
+)
+
+#: re.Pattern : matches the date formats recognized by EMuDate
+_DATE_PATTERN = re.compile(
+    r"(?P<year>\d{4})(?:-(?P<month>\d{2})-(?P<day>\d{2})?)?"
+    r"|(?P<abbr>[A-Z][a-z]+) (?P<abbr_year>\d{4})"
+)
+
+#: re.Pattern : matches the most common time formats recognized by EMuTime
+_TIME_PATTERN = re.compile(r"(\d{1,2}):(\d{2})(?::(\d{2}))?")
+
+#: re.Pattern : matches degrees, minutes, and seconds in a coordinate
+_COORD_PARTS = re.compile(r"\d+(?:\.\d+)?")
+
+#: dict : month numbers keyed to abbreviations used by %b
+_MONTHS = {m: i for i, m in enumerate(month_abbr) if m}
+
+
+@lru_cache(maxsize=None)
+def _slot_names(cls):
+    """Lists the names of the slots defined by a class and its parents"""
+    names = []
+    for cls_ in reversed(cls.__mro__):
+        slots = cls_.__dict__.get("__slots__", ())
+        if isinstance(slots, str):
+            slots = (slots,)
+        names.extend((s for s in slots if s not in {"__dict__", "__weakref__"}))
+    return tuple(names)
+
+
+def _create(cls, val, fmt=_MISSING):
+    """Creates an EMuType object, omitting fmt if it was not provided"""
+    if fmt is _MISSING:
+        return type.__call__(cls, val)
+    return type.__call__(cls, val, fmt)
+
+
+@_cache()
+def _create_cached(cls, val, fmt=_MISSING):
+    """Creates an EMuType object that is reused for the same arguments
+
+    The returned object must not be modified. Use its _clone() method to get
+    a copy that can be.
+    """
+    return _create(cls, val, fmt)
+
+
+def _parse_coord_part(val):
+    """Parses degrees, minutes, or seconds from a coordinate string
+
+    Parameters
+    ----------
+    val : str
+        an unsigned integer or decimal
+
+    Returns
+    -------
+    tuple
+        the part as a float and the format string used to convert it back to
+        a string
+    """
+    dec_places = len(val) - val.index(".") - 1 if "." in val else 0
+    return float(val), _float_format(dec_places)
+
+
+def _dec_places(fmt):
+    """Gets the number of decimal places from a format string"""
+    return int(fmt.strip("{:.f}"))
+
+
+@lru_cache(maxsize=None)
+def _float_format(dec_places):
+    """Gets the format string for a float with the given number of decimals"""
+    return f"{{:.{dec_places}f}}"
+
+
+def _import_numpy():
+    """Imports numpy, which is required to convert values to arrays"""
+    try:
+        import numpy
+    except ImportError as exc:
+        raise ImportError(
+            "numpy is required to convert values to arrays (pip install numpy)"
+        ) from exc
+    return numpy
+
+
+@_cache()
+def _parse_date(val):
+    """Parses a date string, trying each format in _DATE_FORMATS
+
+    Common formats are matched using _DATE_PATTERN. Other strings are parsed
+    using strptime(), and the result is checked to make sure that it can be
+    converted back to the original string.
+
+    Parameters
+    ----------
+    val : str
+        date as a string
+
+    Returns
+    -------
+    tuple
+        the date, kind, and format string
+    """
+    parsed = _match_date(val)
+    if parsed is not None:
+        return parsed
+
+    for kind, fmt in _DATE_FORMATS:
+        try:
+            parsed = datetime.strptime(val, fmt)
+        except ValueError:
+            pass
+        else:
+            value = date(parsed.year, parsed.month, parsed.day)
+            break
+    else:
+        raise ValueError(f"Could not parse date: {repr(val)}")
+
+    # Verify that the parsed value is the same as the original string
+    if val != value.strftime(fmt):
+        formatted = value.strftime(EMuDate.formats[kind])
+        raise ValueError(f"Parsing changed value ('{val}' became '{formatted}')")
+
+    return value, kind, EMuDate.formats[kind]
+
+
+@_cache()
+def _parse_time(val):
+    """Parses a time string, trying each format in _TIME_FORMATS
+
+    Common formats are matched using _TIME_PATTERN. Other strings are parsed
+    using strptime(), and the result is checked to make sure that it can be
+    converted back to the original string.
+
+    Parameters
+    ----------
+    val : str
+        time as a string
+
+    Returns
+    -------
+    tuple
+        the time and format string
+    """
+    parsed = _match_time(val)
+    if parsed is not None:
+        return parsed
+
+    for fmt in _TIME_FORMATS:
+        try:
+            parsed = datetime.strptime(val, fmt)
+        except ValueError:
+            pass
+        else:
+            value = time(
+                parsed.hour,
+                parsed.minute,
+                parsed.second,
+                parsed.microsecond,
+                parsed.tzinfo,
+            )
+            break
+    else:
+        raise ValueError(f"Could not parse time: {repr(val)}")
+
+    # Verify that the parsed value is the same as the original string
+    if val.lstrip("0") != value.strftime(fmt).lstrip("0"):
+        formatted = value.strftime(fmt)
+        raise ValueError(f"Parsing changed value ('{val}' became '{formatted}')")
+
+    # Enforce a consistent output format
+    return value, "%H:%M:%S" if "%S" in fmt else "%H:%M"
+
+
+def _match_date(val):
+    """Parses a date in one of the formats produced by EMu
+
+    Only strings that survive the round trip through strftime() unchanged are
+    matched, so the result is the same as parsing with strptime().
+
+    Parameters
+    ----------
+    val : str
+        date as a string
+
+    Returns
+    -------
+    tuple
+        the date, kind, and format string, or None if val does not match
+    """
+    match = _DATE_PATTERN.fullmatch(val)
+    if match is None:
+        return None
+    year, month, day, abbr, abbr_year = match.groups()
+    try:
+        if abbr:
+            year = int(abbr_year)
+            value = date(year, _MONTHS[abbr], 1)
+            kind = "month"
+        elif day:
+            year = int(year)
+            value = date(year, int(month), int(day))
+            kind = "day"
+        elif month:
+            year = int(year)
+            value = date(year, int(month), 1)
+            kind = "month"
+        else:
+            year = int(year)
+            value = date(year, 1, 1)
+            kind = "year"
+    except (KeyError, ValueError):
+        return None
+    # Years before 1000 are not zero-padded by strftime()
+    if year < 1000:
+        return None
+    return value, kind, EMuDate.formats[kind]
+
+
+def _match_time(val):
+    """Parses a time formatted as H:MM or H:MM:SS
+
+    Parameters
+    ----------
+    val : str
+        time as a string
+
+    Returns
+    -------
+    tuple
+        the time and format string, or None if val does not match
+    """
+    match = _TIME_PATTERN.fullmatch(val)
+    if match is None:
+        return None
+    hour, minute, second = match.groups()
+    try:
+        value = time(int(hour), int(minute), int(second) if second else 0)
+    except ValueError:
+        return None
+    return value, "%H:%M:%S" if second else "%H:%M"
@@ -1,5 +1,6 @@
 """Functions to assess whether EMu field names are tables, references, etc."""
 import re
+import sys
 from functools import lru_cache
 
 #: tuple : suffixes that designate tables in EMu
@@ -23,8 +24,149 @@ REF_PATTERN = "(" + "|".join(REF_SUFFIXES) + ")$"
 #: str : pattern that matches update modifiers
 MOD_PATTERN = r"\(\d*[=\+\-]\)$"
 
+#: int : default maximum number of results to keep in each cache
+CACHE_SIZE = 16384
 
-@lru_cache(maxsize=None)
+#: dict : caches used by xmu keyed to the qualified name of each function
+_caches = {}
+
+
+class _Cache:
+    """Holds the LRU cache for a function so that it can be resized
+
+    Because lru_cache() cannot be resized in place, resizing creates a new
+    cached function and binds it to every module-level name that referred
+    to the old one.
+
+    Parameters
+    ----------
+    func : callable
+        the function to cache
+    maxsize : int
+        maximum number of results to keep in the cache. If None, the cache
+        can grow without limit.
+
+    Attributes
+    ----------
+    name : str
+        the qualified name of the function
+    maxsize : int
+        maximum number of results to keep in the cache
+    cached : callable
+        the function wrapped in an LRU cache
+    """
+
+    def __init__(self, func, maxsize=CACHE_SIZE):
+        self.name = f"{func.__module__}.{func.__qualname__}"
+        self._func = func
+        self.resize(maxsize)
+
+    def resize(self, maxsize):
+        """Replaces the cache with an empty cache of the given size
+
+        Parameters
+        ----------
+        maxsize : int
+            maximum number of results to keep in the cache
+        """
+        old = getattr(self, "cached", None)
+        self.maxsize = maxsize
+        self.cached = lru_cache(maxsize=maxsize)(self._func)
+        if old is not None:
+            _rebind(old, self.cached)
+
+    def cache_info(self):
+        """Reports hits, misses, and size of the cache
+
+        Returns
+        -------
+        functools._CacheInfo
+            named tuple with hits, misses, maxsize, and currsize
+        """
+        return self.cached.cache_info()
+
+    def cache_clear(self):
+        """Removes all results from the cache"""
+        self.cached.cache_clear()
+
+
+def _cache(maxsize=CACHE_SIZE):
+    """Decorates a function with an LRU cache that can be resized
+
+    The cache is registered under the module and name of the function so
+    that it can be inspected using cache_info() and resized using
+    set_cache_size(). The decorator returns the function created by
+    lru_cache() itself, so calls do not go through an extra wrapper.
+    """
+
+    def _decorator(func):
+        cache = _Cache(func, maxsize)
+        _caches[cache.name] = cache
+        return cache.cached
+
+    return _decorator
+
+
+def _rebind(old, new):
+    """Replaces module-level references to one object with another
+
+    Parameters
+    ----------
+    old : object
+        the object to replace
+    new : object
+        the replacement
+    """
+    for module in list(sys.modules.values()):
+        try:
+            namespace = vars(module)
+        except TypeError:
+            continue
+        for key, val in list(namespace.items()):
+            if val is old:
+                namespace[key] = new
+
+
+def cache_info():
+    """Reports hits, misses, and size of each cache used by xmu
+
+    Returns
+    -------
+    dict
+        named tuples with hits, misses, maxsize, and currsize keyed to the
+        qualified name of each cached function, for example, "xmu.utils.is_tab"
+    """
+    return {name: cache.cache_info() for name, cache in _caches.items()}
+
+
+def set_cache_size(maxsize, name=None):
+    """Sets the maximum size of caches used by xmu
+
+    Resizing a cache empties it and replaces the cached function in every
+    module that has imported it. References to the old function held
+    elsewhere, for example, in local variables, keep using the old cache.
+
+    Parameters
+    ----------
+    maxsize : int
+        maximum number of results to keep in each cache. If None, caches can
+        grow without limit.
+    name : str
+        the qualified name of a cached function, as returned by cache_info().
+        If omitted, all caches are resized.
+    """
+    if name is None:
+        caches = list(_caches.values())
+    else:
+        try:
+            caches = [_caches[name]]
+        except KeyError as exc:
+            raise KeyError(f"Cache not found: {name}") from exc
+    for cache in caches:
+        cache.resize(maxsize)
+
+
+@_cache()
 def is_tab(field):
     """Checks if a field name is a table
 
@@ -41,7 +183,7 @@ def is_tab(field):
     return strip_mod(field).endswith(TAB_SUFFIXES)
 
 
-@lru_cache(maxsize=None)
+@_cache()
 def is_nesttab(field):
     """Checks if a field name is a nested table
 
@@ -58,7 +200,7 @@ def is_nesttab(field):
     return strip_mod(field).endswith(NESTTAB_SUFFIXES)
 
 
-@lru_cache(maxsize=None)
+@_cache()
 def is_nesttab_inner(field):
     """Checks if a field name is an inner nested table
 
@@ -75,7 +217,7 @@ def is_nesttab_inner(field):
     return strip_mod(field).endswith(NESTTAB_INNER_SUFFIXES)
 
 
-@lru_cache(maxsize=None)
+@_cache()
 def is_ref_tab(field):
     """Checks if a field name is a reference table
 
@@ -92,7 +234,7 @@ def is_ref_tab(field):
     return is_tab(field) and is_ref(field)
 
 
-@lru_cache(maxsize=None)
+@_cache()
 def is_ref(field):
     """Checks if a field name is a reference
 
@@ -109,7 +251,7 @@ def is_ref(field):
     return strip_mod(field).endswith(REF_SUFFIXES)
 
 
-@lru_cache(maxsize=None)
+@_cache()
 def has_mod(field):
     """Checks if a field name ends with an update modifier
 
@@ -129,7 +271,7 @@ def has_mod(field):
     return result
 
 
-@lru_cache(maxsize=None)
+@_cache()
 def strip_tab(field):
     """Strips table suffixes from a field name
 
@@ -146,7 +288,7 @@ def strip_tab(field):
     return re.sub(TAB_PATTERN, "", strip_mod(field))
 
 
-@lru_cache(maxsize=None)
+@_cache()
 def strip_mod(field):
     """Strips update modifier from a field name
 
@@ -163,7 +305,7 @@ def strip_mod(field):
     return field.rsplit("(", 1)[0]
 
 
-@lru_cache(maxsize=None)
+@_cache()
 def get_mod(field):
     """Gets the update modifier from a field name
 